@@ -0,0 +1,98 @@
+"""Micro-benchmark of Game.parse against the previous multi-pass parser.
+
+Usage: python -m benchmarks.bench_parser [number of reports]"""
+import random
+import re
+import sys
+import timeit
+
+from src.modules.game import Game
+
+
+def legacy_parse(text: str, switched_team=False):
+    """Game.parse as it was before the single-pass tokenizer, kept for comparison."""
+
+    def find_players(txt: list[str]):
+        res = []
+        for e in txt:
+            if e.startswith(">"):
+                res.append(e[4:].lower().split(":** "))
+            elif e == "SEPARATOR":
+                res.append(e)
+        return res
+
+    def calculate_seconds(time) -> int:
+        if "m" in time:
+            if 'sec' in time:
+                time = time.replace("m", " * 60 + ").replace("sec", "")
+            else:
+                time = time.replace("m", " * 60")
+        else:
+            time = time.replace("sec", "")
+        res = eval(time)
+        return min(res, 420)
+
+    t = text.splitlines()
+    t = find_players(t)
+    separator = t.index("SEPARATOR")
+
+    team1 = {x for x, y in t[:separator]} if not switched_team else {x for x, y in t[separator + 1:]}
+    t.pop(separator)
+    for elem in t:
+        if elem[0].startswith("[og] "):
+            elem[0] = elem[0].replace("[og] ", "")
+            elem[1] = elem[1].replace("g", "og")
+    try:
+        t = [(x, *y.split(" ")) for x, y in t]
+    except ValueError:
+        return
+    d = {}
+    for name, *stats in t:
+        if name in d:
+            d[name] += stats
+        else:
+            d[name] = stats
+    if len(d) <= 7:
+        return
+
+    game = {"team1": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}},
+            "team2": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}}}
+    for name, stats in d.items():
+        for stat in stats:
+            if Game.is_time(stat):
+                number, stat_name = calculate_seconds(stat), Game.stat_match["m"]
+            else:
+                number_stat_name = re.findall(r"\d+|\w+", stat)
+                try:
+                    number, stat_name = int(number_stat_name[0]), Game.stat_match[number_stat_name[1]]
+                except KeyError:
+                    continue
+            team = "team1" if name in team1 else "team2"
+            game[team][stat_name][name] = number
+    return game
+
+
+def synthetic_report(rnd: random.Random, players_per_team: int = 5) -> str:
+    lines = []
+    for side in ("red", "blue"):
+        if lines:
+            lines.append("SEPARATOR")
+        for i in range(players_per_team):
+            seconds = rnd.randint(30, 420)
+            m, s = divmod(seconds, 60)
+            stats = [f"{m}m{s}sec" if s else f"{m}m"]
+            for stat in ("g", "a", "s", "cs"):
+                if rnd.random() < 0.4:
+                    stats.append(f"{rnd.randint(1, 4)}{stat}")
+            lines.append(f"> **{side} Player {i}:** " + " ".join(stats))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rnd = random.Random(0)
+    reports = [synthetic_report(rnd) for _ in range(n)]
+    assert all(Game.parse(r) == legacy_parse(r) for r in reports), "the parsers disagree"
+    for name, parse in (("legacy", legacy_parse), ("Game.parse", Game.parse)):
+        seconds = min(timeit.repeat(lambda: [parse(r) for r in reports], number=1, repeat=5))
+        print(f"{name:<12} {n} reports in {seconds * 1000:8.2f}ms ({seconds / n * 1e6:.1f}us/report)")
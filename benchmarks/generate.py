@@ -0,0 +1,117 @@
+"""Fabricate a season under a resources/ tree: teams, malus, raw half reports, results and report texts.
+
+Usage: python -m benchmarks.generate <directory> [--confs N] [--teams N] [--matchdays N] [--players N] [--seed N]"""
+import argparse
+import json
+import os
+import random
+from collections import Counter
+
+from src.modules.game import Game
+from src.modules.raw_reports import RawReports
+
+CONFS = ("western", "eastern", "northern", "southern")
+REPORT_CHANNEL = 726932351241814117
+
+
+def half_report(rnd: random.Random, players: tuple[list[str], list[str]], goals: tuple[int, int]) -> str:
+    """One half in the format of the #report-official embeds, both sides separated by SEPARATOR."""
+    lines = []
+    for side, names in enumerate(players):
+        if lines:
+            lines.append("SEPARATOR")
+        scorers = Counter(rnd.choice(names) for _ in range(goals[side]))
+        for name in names:
+            m, s = divmod(rnd.randint(30, 420), 60)
+            stats = [f"{m}m{s}sec" if s else f"{m}m"]
+            if scorers[name]:
+                stats.append(f"{scorers[name]}g")
+            for stat in ("a", "s"):
+                if rnd.random() < 0.4:
+                    stats.append(f"{rnd.randint(1, 3)}{stat}")
+            if goals[1 - side] == 0 and rnd.random() < 0.3:
+                stats.append("1cs")
+            lines.append(f"> **{name}:** " + " ".join(stats))
+    return "\n".join(lines)
+
+
+def report_text(matchday: int, team1: str, team2: str, score: tuple[int, int], message_ids: list[int]) -> str:
+    """What a captain writes after !create_report."""
+    links = "\n".join(f"https://discord.com/channels/635822055601864705/{REPORT_CHANNEL}/{message_id}"
+                      for message_id in message_ids)
+    return f"matchday {matchday}\n{team1} {score[0]} - {score[1]} {team2}\n{links}\n" \
+           f"rec: https://thehax.pl/forum/powtorki.php?nagranie={message_ids[0]:x}"
+
+
+def round_robin(teams: list[str], matchday: int) -> list[tuple[str, str]]:
+    """Pairings of one matchday with the circle method, a team is off when the count is odd."""
+    teams = teams + [None] * (len(teams) % 2)
+    n = len(teams)
+    rotation = (matchday - 1) % (n - 1)
+    circle = [teams[0]] + teams[1:][rotation:] + teams[1:][:rotation]
+    pairs = [(circle[i], circle[n - 1 - i]) for i in range(n // 2)]
+    return [(a, b) for a, b in pairs if a is not None and b is not None]
+
+
+def generate(root: str, confs: int = 2, teams: int = 12, matchdays: int = 22, players: int = 6, seed: int = 0):
+    """Write a whole season under root/resources and return the create_report texts."""
+    rnd = random.Random(seed)
+    resources = os.path.join(root, "resources")
+    for folder in ("teams", "malus", "players", "tables", "results", "raw"):
+        os.makedirs(os.path.join(resources, folder), exist_ok=True)
+
+    # two letters names: no digit for the score line parser and no name contained in another one
+    conf_teams = {conf: [f"{conf[:4]} {chr(97 + i // 26)}{chr(97 + i % 26)}" for i in range(teams)]
+                  for conf in CONFS[:confs]}
+    rosters = {team: [f"{team.replace(' ', '')}p{i}" for i in range(players)]
+               for conf_team_names in conf_teams.values() for team in conf_team_names}
+    with open(os.path.join(resources, "teams", "teams.json"), "w+") as f:
+        json.dump(conf_teams, f)
+    with open(os.path.join(resources, "malus", "malus.json"), "w+") as f:
+        json.dump({conf: {team: 0 for team in names} for conf, names in conf_teams.items()}, f)
+    with open(os.path.join(resources, "players", "players.json"), "w+") as f:
+        json.dump({}, f)
+
+    texts = []
+    message_id = 10 ** 17
+    for matchday in range(1, matchdays + 1):
+        for conf, names in conf_teams.items():
+            for team1, team2 in round_robin(names, matchday):
+                score = rnd.randint(0, 6), rnd.randint(0, 6)
+                halves, message_ids = [], []
+                for half in (0, 1):
+                    goals = (score[0] // 2 + half * (score[0] % 2), score[1] // 2 + half * (score[1] % 2))
+                    side_players = (rosters[team1][:5], rosters[team2][:5]) if half == 0 else \
+                        (rosters[team2][-5:], rosters[team1][-5:])
+                    text = half_report(rnd, side_players, goals if half == 0 else goals[::-1])
+                    message_id += 1
+                    message_ids.append(message_id)
+                    with open(os.path.join(resources, "raw", os.path.basename(
+                            RawReports.filename(REPORT_CHANNEL, message_id))), "w+", encoding="utf-8") as raw:
+                        raw.write(text)
+                    halves.append(Game.parse(text, half != 0))
+
+                title = f"{team1} {score[0]} - {score[1]} {team2}"
+                game = {"warnings": [], "recs": [], "matchday": matchday,
+                        "score": {team1: score[0], team2: score[1]}, "title": title, "conf": conf,
+                        "discord_infos": [{"channel_id": REPORT_CHANNEL, "message_id": i} for i in message_ids]}
+                game.update({team: {stat: dict(Counter(halves[0][team][stat]) + Counter(halves[1][team][stat]))
+                                    for stat in halves[0][team]} for team in ("team1", "team2")})
+                os.makedirs(os.path.join(resources, "results", str(matchday)), exist_ok=True)
+                with open(os.path.join(resources, "results", str(matchday), f"{title}.json"), "w+") as f:
+                    json.dump(game, f, indent=4)
+                texts.append(report_text(matchday, team1, team2, score, message_ids))
+    return texts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory")
+    parser.add_argument("--confs", type=int, default=2)
+    parser.add_argument("--teams", type=int, default=12)
+    parser.add_argument("--matchdays", type=int, default=22)
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    n = len(generate(args.directory, args.confs, args.teams, args.matchdays, args.players, args.seed))
+    print(f"Generated {n} results under {os.path.join(args.directory, 'resources')}")
@@ -0,0 +1,115 @@
+"""Benchmark suite of the stats pipeline on generated seasons.
+
+Usage: python -m benchmarks.run [--sizes small medium large] [--repeat N]
+
+Each size is generated in a temporary directory, timings (best of --repeat, in milliseconds) are printed next to
+the previous run and stored in benchmarks/results/<date>.json."""
+import argparse
+import datetime
+import glob
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from benchmarks.generate import generate
+
+SIZES = {
+    "small": dict(confs=2, teams=8, matchdays=10),
+    "medium": dict(confs=2, teams=12, matchdays=22),
+    "large": dict(confs=3, teams=12, matchdays=30),
+}
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def bench_size(size: str, repeat: int) -> dict[str, float]:
+    directory = tempfile.mkdtemp(prefix=f"bench-{size}-")
+    texts = generate(directory, **SIZES[size])
+    os.chdir(directory)
+
+    # the modules read resources/ relatively to the working directory, import them once it is set up
+    from src.modules.data import Data
+    from src.modules.game import Game
+    from src.modules.game_index import GAMES
+    from src.modules.players import SERVER, Leaderboard, Updater
+    from src.modules.raw_reports import RawReports
+    from src.modules.storage import STORAGE
+    from src.modules.table import Table
+    from src.modules.utils import find_game
+
+    SERVER.update()
+    raw = [(open(filename, encoding="utf-8").read(), i % 2 == 1)
+           for i, filename in enumerate(sorted(glob.glob(os.path.join(RawReports.path, "*.txt"))))]
+    # reports of matchdays that do not exist yet, construct_match_data refuses existing games
+    new_texts = [re.sub(r"^matchday (\d+)", lambda m: f"matchday {int(m[1]) + 1000}", text) for text in texts]
+    rnd = random.Random(0)
+    lookups = [(game["matchday"], rnd.choice(list(game["score"]))) for game in STORAGE.games()]
+    conf = next(iter(STORAGE.load_teams()))
+    # SERVER only keeps the western and eastern tables
+    edited = next(game for game in STORAGE.games() if game["conf"] == "western")
+
+    timings = {
+        "results": len(texts),
+        "Game.parse (all halves)": best_of(repeat, lambda: [Game.parse(text, switched) for text, switched in raw]),
+        "Data.construct_match_data (all)": best_of(repeat, lambda: [Data().construct_match_data(t) for t in new_texts]),
+        "Updater.update_all": best_of(repeat, lambda: Updater().update_all()),
+        f"Table.update ({conf})": best_of(repeat, lambda: Table(conf).update()),
+        "Leaderboard.sort_by (goals, 20 pages)": best_of(
+            repeat, lambda: [Leaderboard.sort_by("goals")[i:i + 20] for i in range(0, 400, 20)]),
+        "find_game (every result)": best_of(repeat, lambda: [find_game(md, team) for md, team in lookups]),
+        "SERVER.apply (edit of one result)": best_of(repeat, lambda: SERVER.apply(edited, edited)),
+    }
+    GAMES.rebuild()
+    return timings
+
+
+def previous_results():
+    files = sorted(glob.glob(os.path.join(RESULTS_PATH, "*.json")))
+    if not files:
+        return {}
+    with open(files[-1]) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    previous = previous_results()
+    results = {}
+    cwd = os.getcwd()
+    for size in args.sizes:
+        results[size] = bench_size(size, args.repeat)
+        from src.modules.persistence import WRITE_BEHIND
+        WRITE_BEHIND.flush()
+        os.chdir(cwd)
+        print(f"\n{size} ({results[size]['results']} results)")
+        for name, ms in results[size].items():
+            if name == "results":
+                continue
+            before = previous.get(size, {}).get(name)
+            compared = f"{before:10.2f}ms before" if before is not None else ""
+            print(f"  {name:<40} {ms:10.2f}ms {compared}")
+
+    os.makedirs(RESULTS_PATH, exist_ok=True)
+    path = os.path.join(RESULTS_PATH, f"{datetime.datetime.now():%Y-%m-%d-%H%M%S}.json")
+    with open(path, "w+") as f:
+        json.dump(results, f, indent=4)
+    print(f"\nSaved to {path}")
+
+
+if __name__ == '__main__':
+    main()
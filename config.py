@@ -1 +1,32 @@
 extensions: list[str] = ['src.commands.admin', 'src.commands.infos', 'src.commands.captains']
+
+# "json" (files under resources/) or "sqlite", see src/modules/storage.py
+storage: str = "json"
+sqlite_path: str = "resources/league.db"
+
+# Discord fetches of half reports running at the same time
+max_concurrent_fetches: int = 4
+
+# Threads reading the storage for the commands, writes go through a single thread, see src/modules/data_access.py
+read_threads: int = 4
+
+# Seconds players and tables writes are held back to coalesce bursts of edits
+flush_interval: float = 5.0
+
+# Aggregates the bot starts from, written behind every change, see Server in src/modules/players.py
+server_snapshot_path: str = "resources/server.snapshot"
+
+# Rendered menu pages kept in the LRU page cache
+page_cache_size: int = 512
+
+# Command latency histograms are dumped there every metrics_dump_interval seconds, see !metrics
+metrics_path: str = "resources/metrics.json"
+metrics_dump_interval: float = 300
+
+# Every mutation is logged in resources/events/, the results are snapshot and the log compacted that often (seconds)
+events_compact_interval: float = 24 * 3600
+
+# Read-only JSON API for the website and overlays, see src/modules/api.py
+api_enabled: bool = False
+api_host: str = "127.0.0.1"
+api_port: int = 8080
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""Print the binary snapshot of the aggregates as json, for humans.
+
+Usage: python export_snapshot.py [path/to/server.snapshot] [--player NAME]"""
+
+import argparse
+import json
+
+import config
+from src.modules.snapshot import Snapshot
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", default=config.server_snapshot_path)
+    parser.add_argument("--player")
+    args = parser.parse_args()
+
+    with Snapshot(args.path) as snapshot:
+        content = snapshot.player(args.player.lower()) if args.player else snapshot.to_json()
+    print(json.dumps(content, indent=4))
@@ -1,4 +1,8 @@
 # -*- coding: utf-8 -*-
+import time
+
+# before the other imports, the startup time covers them too
+STARTED = time.perf_counter()
 
 import json
 import os
@@ -6,13 +10,18 @@ import os
 import discord
 from discord import Embed
 from discord.abc import GuildChannel
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ext.commands import Bot
 from discord.ext.commands import has_permissions
 from dotenv import load_dotenv
 
 import config
+from src.modules.api import StatsApi
+from src.modules.data_access import DATA
+from src.modules.events import EVENTS
+from src.modules.metrics import METRICS
 from src.modules.players import SERVER
+from src.modules.prefixes import PREFIXES
 from src.modules.utils import TeamsList, create_menu
 
 load_dotenv()
@@ -22,15 +31,14 @@ intents = discord.Intents.default()
 
 
 def get_prefix(client, message):  # first we define get_prefix
-    with open('prefixes.json', 'r') as f:  # we open and read the prefixes.json, assuming it's in the same file
-        prefixes = json.load(f)  # load the json as prefixes
-
     try:
         id = str(message.guild.id)
     except Exception:
         id = 0
-    return prefixes[id] if id in prefixes else "!"  # receive the prefix for the guild id given
+    return PREFIXES.get(id)  # receive the prefix for the guild id given, served from memory
+
 
+STATS_API = StatsApi(config.api_host, config.api_port) if config.api_enabled else None
 
 BOT: Bot = commands.Bot(command_prefix=get_prefix, case_insensitive=True, intents=intents,
                         chunk_guilds_at_startup=False)
@@ -54,13 +62,7 @@ async def set_prefix(ctx, prefix="!"):
     """Set a new prefix for this bot.
 
     With no args, this resets the prefix to the default one."""
-    with open('prefixes.json', 'r') as f:
-        prefixes = json.load(f)
-
-    prefixes[str(ctx.guild.id)] = prefix
-
-    with open('prefixes.json', 'w') as f:
-        json.dump(prefixes, f, indent=4)
+    PREFIXES.set(ctx.guild.id, prefix)
 
     await ctx.send(f'Prefix changed to: {prefix}')
 
@@ -77,28 +79,59 @@ async def reload(ctx):
 async def on_ready():
     """On ready event."""
     print(f'{BOT.user} has connected\n')
+    if not rebuild.is_running() and rebuild.current_loop == 0:
+        METRICS.record("startup", (time.perf_counter() - STARTED) * 1000)
+        rebuild.start()
+    if not dump_metrics.is_running():
+        dump_metrics.start()
+    if not compact_events.is_running():
+        compact_events.start()
+    if STATS_API is not None and not STATS_API.running:
+        await STATS_API.start()
+        print(f"Stats API listening on http://{config.api_host}:{config.api_port}\n")
 
 
-@BOT.event
-async def on_guild_remove(guild):  # when the bot is removed from the guild
-    with open('prefixes.json', 'r') as f:  # read the file
-        prefixes = json.load(f)
+@BOT.before_invoke
+async def start_command_timer(ctx):
+    METRICS.start_command(ctx.command.qualified_name)
+
+
+@BOT.after_invoke
+async def stop_command_timer(ctx):
+    METRICS.end_command()
 
-    try:
-        prefixes.pop(str(guild.id))  # find the guild.id that bot was removed from
-    except KeyError:
-        pass
 
-    with open('prefixes.json', 'w') as f:  # deletes the guild.id as well as its prefix
-        json.dump(prefixes, f, indent=4)
+@tasks.loop(count=1)
+async def rebuild():
+    """Check the aggregates loaded from the snapshot against the results, once connected.
+
+    The rebuild runs on the writer thread and swaps its result in at the end, commands are served from the
+    snapshot meanwhile."""
+    METRICS.start_command("startup rebuild")
+    await DATA.write(SERVER.update)
+    METRICS.end_command()
+    print(f"Aggregates rebuilt {time.perf_counter() - STARTED:.1f}s after the start\n")
+
+
+@tasks.loop(seconds=config.metrics_dump_interval)
+async def dump_metrics():
+    await DATA.write(METRICS.dump, config.metrics_path)
+
+
+@tasks.loop(seconds=config.events_compact_interval)
+async def compact_events():
+    if next(EVENTS.events(), None) is not None:
+        await DATA.write(EVENTS.compact)
+
+
+@BOT.event
+async def on_guild_remove(guild):  # when the bot is removed from the guild
+    PREFIXES.remove(guild.id)  # deletes the guild.id as well as its prefix
 
 
 def get_prefix2(id):
     """Return the prefix of this bot for a specific guild or ! as default"""
-    with open('prefixes.json', 'r') as f:
-        prefixes = json.load(f)
-
-    return prefixes[id] if id in prefixes else "!"
+    return PREFIXES.get(id)
 
 
 @BOT.command(hidden=True, enabled=False)
@@ -156,6 +189,8 @@ async def on_command_error(ctx, error):
 
 
 if __name__ == '__main__':
-    SERVER.update()
+    EVENTS.recover()
+    # the snapshot is loaded before connecting, so no command waits for it or for the rebuild
+    SERVER.ensure_loaded()
     # Updater().update_all()
     BOT.run(TOKEN)
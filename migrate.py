@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""One-shot import of the json tree under resources/ into the SQLite database.
+
+Usage: python migrate.py [path/to/league.db]
+Then set storage = "sqlite" in config.py."""
+
+import sys
+import time
+
+import config
+from src.modules.storage import JsonStorage, SqliteStorage, migrate
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else config.sqlite_path
+    start = time.perf_counter()
+    n = migrate(JsonStorage(), SqliteStorage(path))
+    print(f"Imported {n} results into {path} in {time.perf_counter() - start:.2f}s")
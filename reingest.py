@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Rebuild every result from the raw half reports in resources/raw/.
+
+Usage: python reingest.py [--workers N]
+
+The raw reports are parsed in parallel with Game.parse, the halves merged like create_report does,
+then all results and aggregates are written at once.
+Warning: stats and nicks edited by admins are replaced by what the raw reports say.
+
+The results give the matchday, score and links of each game, so they are walked and their halves looked up in
+resources/raw/<channel_id>-<message_id>.txt. Raw files saved before the reports were cached under those names are
+named after the recording: nothing links them to a result, they are counted but not re-ingested, and the results
+whose halves are missing are kept as they are."""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.modules.game import Game
+from src.modules.raw_reports import RawReports
+
+
+def parse_halves(texts: list[str]):
+    """Parse the halves of one game, runs in a worker process."""
+    try:
+        return [Game.parse(text, i != 0) for i, text in enumerate(texts)]
+    except ValueError as e:
+        return str(e)
+
+
+def raw_halves(raw_reports: RawReports, game: dict):
+    texts = [raw_reports.get(info["channel_id"], info["message_id"]) for info in game.get("discord_infos", [])]
+    return texts if texts and None not in texts else None
+
+
+def legacy_files(raw_reports: RawReports) -> list[str]:
+    """Raw files not named <channel_id>-<message_id>.txt."""
+    try:
+        return [name for name in os.listdir(raw_reports.path) if not re.fullmatch(r"\d+-\d+\.txt", name)]
+    except FileNotFoundError:
+        return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, default: one per cpu")
+    args = parser.parse_args()
+
+    from src.modules.data import Data
+    from src.modules.events import EVENTS
+    from src.modules.players import SERVER
+    from src.modules.storage import STORAGE
+
+    start = time.perf_counter()
+    raw_reports = RawReports()
+    games, texts, skipped = [], [], []
+    for game in STORAGE.games():
+        halves = raw_halves(raw_reports, game)
+        if halves is None:
+            skipped.append(game["title"])
+            continue
+        games.append(game)
+        texts.append(halves)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        parsed = list(executor.map(parse_halves, texts, chunksize=16))
+
+    updated = []
+    for game, halves in zip(games, parsed):
+        if isinstance(halves, str):
+            skipped.append(f"{game['title']} ({halves})")
+            continue
+        game.update(Data._sum_merge(*halves))
+        updated.append(game)
+
+    STORAGE.save_games(updated)
+    SERVER.update()
+    # the results were rewritten outside of the event log, they become its new starting point
+    EVENTS.compact()
+
+    print(f"Re-ingested {len(updated)} results in {time.perf_counter() - start:.2f}s")
+    if skipped:
+        print(f"Skipped {len(skipped)} results:\n - " + "\n - ".join(skipped))
+    legacy = legacy_files(raw_reports)
+    if legacy:
+        print(f"{len(legacy)} raw files are named after their recording and can not be matched to a result")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""Rebuild the stored results and malus from the event log: the last snapshot, then the events after it.
+
+Usage: python replay.py [--compact]
+With --compact, a new snapshot is taken afterwards and the replayed events are archived."""
+
+import argparse
+import time
+
+from src.modules.events import EVENTS
+from src.modules.players import SERVER
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compact", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    EVENTS.restore()
+    SERVER.update()
+    if args.compact:
+        EVENTS.compact()
+    print(f"Replayed up to event {EVENTS.seq} in {time.perf_counter() - start:.2f}s")
@@ -1,58 +1,30 @@
-import glob
-import json
-import os
 import re
 
-import discord
 from discord import Embed
 from discord.ext import commands
 
 from src.modules.colors import Color
 from src.modules.data import Data
+from src.modules.data_access import DATA
+from src.modules.events import RECS_EDITED, STAT_EDITED, NICK_EDITED
+from src.modules.game_index import GAMES
+from src.modules.metrics import METRICS
 from src.modules.players import SERVER
 from src.modules.roles import Roles
-from src.modules.utils import find_game, delete_game, create_menu, MatchdayList
+from src.modules.teams import TEAMS
+from src.modules.utils import find_game, delete_game, add_malus, create_menu, MatchdayList
 
 
 class Admin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self._channels: dict[int, discord.abc.Messageable] = dict()
-
-    async def get_channel(self, channel_id: int) -> discord.abc.Messageable:
-        if self._channels:
-            return self._channels[channel_id]
-
-        self._channels: dict[int, discord.abc.Messageable] = {
-            726932351241814117: await self.bot.fetch_channel(726932351241814117),  # offi
-            726932424172371968: await self.bot.fetch_channel(726932424172371968)  # fs
-        }
-        return self._channels[channel_id]
-
-    async def save_raw_report(self, channel_id: int, message_id: int):
-        channel = await self.get_channel(channel_id)
-        message = await channel.fetch_message(message_id)
-        try:
-            embed = message.embeds[0]
-        except IndexError:
-            raise ValueError("Error : The message is not a valid report message")
-        filename = embed.footer.text.replace("/", "").replace("Recording: ", "")
-        full_path = os.path.join("resources/raw/", filename + ".txt")
-        d_embed = embed.to_dict()
-        game = d_embed["fields"][0]["value"] + "\nSEPARATOR\n" + d_embed["fields"][1]["value"]
-
-        with open(full_path, "w+", encoding="utf-8") as raw:
-            raw.write(game)
-
-        return game
 
     @commands.command()
     @commands.has_any_role(*Roles.admins())
     async def delete(self, ctx, matchday: int, one_team):
         """Delete a game report."""
-        deleted_game = delete_game(matchday, one_team)
-        await ctx.send(embed=Embed(color=Color.DEFAULT, description=f"{deleted_game} was deleted from the db"))
-        SERVER.update()
+        game = await DATA.write(delete_game, matchday, one_team, author=ctx.author.display_name)
+        await ctx.send(embed=Embed(color=Color.DEFAULT, description=f"{game['title']} was deleted from the db"))
 
     @commands.group(invoke_without_command=True)
     @commands.has_any_role(*Roles.admins())
@@ -76,7 +48,7 @@ class Admin(commands.Cog):
             I use: edit rec 5 snakin thehax_link1 thehax_link2
 
         Warning: This will override the previous recs"""
-        data = Data(data=find_game(matchday, one_team))
+        data = Data(data=await DATA.read(find_game, matchday, one_team))
         warnings = [""]
         if not recs:
             warning = "Missing recs in your message when you wanted to edit the game"
@@ -90,7 +62,7 @@ class Admin(commands.Cog):
             description=f"Recs: {recs_txt} saved with {1 - len(warnings)} warning(s).\n{warning_msg}")
                        .set_footer(text=f"Match: {data.title}")
                        )
-        data.save()
+        await DATA.write(data.save, RECS_EDITED, ctx.author.display_name)
 
     @edit.command()
     @commands.has_any_role(*Roles.admins())
@@ -104,11 +76,9 @@ class Admin(commands.Cog):
         Note: Put teams in " " please.
 
         Warning: This will override the previous score"""
-        team1, team2 = team1.lower(), team2.lower()
-        data = Data(data=find_game(matchday, team1))
-        path = data.full_path
-        data.edit_score(team1, team2, score_team1, score_team2)
-        os.remove(path)
+        team1, team2 = TEAMS.resolve(team1), TEAMS.resolve(team2)
+        data = Data(data=await DATA.read(find_game, matchday, team1))
+        await DATA.write(data.edit_score, team1, team2, score_team1, score_team2, author=ctx.author.display_name)
         await ctx.send(embed=Embed(
             color=Color.DEFAULT,
             title=f"{data.title}: Score edited by {ctx.author.display_name}")
@@ -134,7 +104,7 @@ class Admin(commands.Cog):
         Note: You can not edit time, only: goals assists saves cs and own goals"""
         stats = [re.split(r" *(.*) (\d+) (.*) *", stat) for stat in one_stat_per_line.splitlines()]
         stats = [(name.lower(), int(stat), stat_name.lower()) for _, name, stat, stat_name, _ in stats]
-        data = Data(data=find_game(matchday, one_team))
+        data = Data(data=await DATA.read(find_game, matchday, one_team))
         for player, stat, stat_name in stats:
             data.update_stat(player, stat, stat_name)
         desc = "\n".join([f"{player} {stat} {stat_name}" for player, stat, stat_name in stats])
@@ -146,7 +116,7 @@ class Admin(commands.Cog):
             title=f"{data.title}: Stats edited by {ctx.author.display_name}",
             description=desc)
         )
-        data.save()
+        await DATA.write(data.save, STAT_EDITED, ctx.author.display_name)
 
     @edit.command(aliases=["nick", "nicks"])
     @commands.has_any_role(*Roles.admins())
@@ -167,7 +137,7 @@ class Admin(commands.Cog):
         except Exception:
             raise ValueError(f"Error : Could not understand {nicknames_list}")
 
-        data = Data(data=find_game(matchday, one_team))
+        data = Data(data=await DATA.read(find_game, matchday, one_team))
         for nickname_in_match, real_nickname in nicknames:
             data.update_nick(nickname_in_match, real_nickname)
         desc = "\n".join([f"{before} -> {after}" for before, after in nicknames])
@@ -176,38 +146,53 @@ class Admin(commands.Cog):
             title=f"{data.title}: Nicknames edited by {ctx.author.display_name}",
             description=desc)
         )
-        data.save()
+        await DATA.write(data.save, NICK_EDITED, ctx.author.display_name)
 
     @commands.command(aliases=["malus"])
     @commands.has_any_role(*Roles.admins())
     async def add_malus(self, ctx, team):
-        with open("resources/malus/malus.json") as malus_fp:
-            teams = json.load(malus_fp)
-            all_teams = list(teams["western"].keys()) + list(teams["eastern"].keys())
-        if team not in all_teams:
-            raise ValueError(f"Error : {team} is not a team I can find.")
-        conf = "western" if team in teams["western"] else "eastern"
-        teams[conf][team] += 1
-        with open("resources/malus/malus.json", "w+") as malus_fp:
-            json.dump(teams, malus_fp, indent=4)
+        await DATA.write(add_malus, team, author=ctx.author.display_name)
         await ctx.send(embed=Embed(color=Color.DEFAULT, description=f"One malus was added to {team}"))
-        SERVER.update()
 
     @commands.command(aliases=["w"])
-    async def warnings(self, ctx):
+    async def warnings(self, ctx, *filters):
         """See all warnings.
 
-        A warning is added whenever an information was missing in a report."""
-        path = os.path.join("resources/results/")
-        filenames = [filename for filename in glob.glob(f"{path}/*/*")]
-        data = []
-        for filename in filenames:
-            with open(filename, "r") as f:
-                d = json.load(f)
-                if d["warnings"]:
-                    data.append(d["score"])
-
-        await create_menu(MatchdayList, ctx, data, matchday="[ALL]")
+        A warning is added whenever an information was missing in a report.
+        Filter them with a matchday and/or a team.
+
+        Example:
+            !w
+            !w 5
+            !w 5 snakin"""
+        matchday = next((int(f) for f in filters if f.isdigit()), None)
+        team = " ".join(f for f in filters if not f.isdigit()) or None
+        version, games = SERVER.versioned(GAMES.games_with_warnings, matchday, team)
+        data = [game["score"] for game in games]
+        if not data:
+            raise ValueError("Error : There is no warning for these filters")
+
+        await create_menu(MatchdayList, ctx, data, matchday="[ALL]" if matchday is None else matchday,
+                          version=version, variant=f"warnings {team}")
+
+    @commands.command()
+    @commands.has_any_role(*Roles.admins())
+    async def metrics(self, ctx):
+        """See how long commands take.
+
+        For each command: number of calls, median, 95th percentile and max in ms,
+        then the share of its time spent in io, parsing, server update and discord calls."""
+        desc = "```\n"
+        desc += f'{"command":<20} {"n":>5} {"p50":>6} {"p95":>6} {"max":>7}\n'
+        for name, command in sorted(METRICS.commands.items(), key=lambda item: -item[1].total.total):
+            total = command.total
+            if total.count:
+                desc += f"{name:<20} {total.count:>5} {total.percentile(50):>6.0f} {total.percentile(95):>6.0f} " \
+                        f"{total.max:>7.0f}\n"
+                desc += "".join(f"  {span:<18} {100 * h.total / total.total:>5.1f}%\n"
+                                for span, h in command.spans.items())
+        desc += "```"
+        await ctx.send(embed=Embed(color=Color.DEFAULT, title="Command latencies (ms)", description=desc))
     #
     # @commands.command(enabled=False)
     # async def set_teams(self, ctx, *category_id: int):
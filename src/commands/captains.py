@@ -1,46 +1,52 @@
-import json
-import os
+import asyncio
 
 import discord
 from discord import Embed
 from discord.ext import commands
 
+import config
 from src.modules.colors import Color
 from src.modules.data import Data
+from src.modules.data_access import DATA
 from src.modules.game import Game
-from src.modules.json_encoder import EnhancedJSONEncoder
+from src.modules.metrics import METRICS
+from src.modules.raw_reports import RAW_REPORTS
 
 
 class Captain(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._channels: dict[int, discord.abc.Messageable] = dict()
+        # the halves of a report are fetched together, only the first one fetches the channels
+        self._channels_lock = asyncio.Lock()
+        self._fetch_limit = asyncio.Semaphore(config.max_concurrent_fetches)
 
     async def get_channel(self, channel_id: int) -> discord.abc.Messageable:
-        if self._channels:
-            return self._channels[channel_id]
-
-        self._channels: dict[int, discord.abc.Messageable] = {
-            726932351241814117: await self.bot.fetch_channel(726932351241814117),  # offi
-            726932424172371968: await self.bot.fetch_channel(726932424172371968)  # fs
-        }
+        async with self._channels_lock:
+            if not self._channels:
+                self._channels = {
+                    726932351241814117: await self.bot.fetch_channel(726932351241814117),  # offi
+                    726932424172371968: await self.bot.fetch_channel(726932424172371968)  # fs
+                }
         return self._channels[channel_id]
 
     async def save_raw_report(self, channel_id: int, message_id: int):
-        channel = await self.get_channel(channel_id)
-        message = await channel.fetch_message(message_id)
+        game = await DATA.read(RAW_REPORTS.get, channel_id, message_id)
+        if game is not None:
+            return game
+
+        async with self._fetch_limit:
+            with METRICS.span("discord"):
+                channel = await self.get_channel(channel_id)
+                message = await channel.fetch_message(message_id)
         try:
             embed = message.embeds[0]
         except IndexError:
             raise ValueError("Error : The message is not a valid report message")
-        filename = embed.footer.text.replace("/", "").replace("Recording: ", "")
-        full_path = os.path.join("resources/raw/", filename + ".txt")
         d_embed = embed.to_dict()
         game = d_embed["fields"][0]["value"] + "\nSEPARATOR\n" + d_embed["fields"][1]["value"]
 
-        with open(full_path, "w+", encoding="utf-8") as raw:
-            raw.write(game)
-
+        await DATA.write(RAW_REPORTS.put, channel_id, message_id, game)
         return game
 
     @commands.command(aliases=["c", "cp"])
@@ -72,12 +78,12 @@ class Captain(commands.Cog):
             thehax link(s) to the rec(s)
         """
         data = Data()
-        data.construct_match_data(txt)
-        # data = construct_match_data(txt)
-        halves = []
-        for i, info in enumerate(data.discord_infos):
-            text_game = await self.save_raw_report(info.channel_id, info.message_id)
-            halves.append(Game.parse(text_game, i != 0))
+        with METRICS.span("parsing"):
+            data.construct_match_data(txt)
+        text_games = await asyncio.gather(*(self.save_raw_report(info.channel_id, info.message_id)
+                                            for info in data.discord_infos))
+        with METRICS.span("parsing"):
+            halves = [Game.parse(text_game, i != 0) for i, text_game in enumerate(text_games)]
         data.construct_report(halves)
 
         if not data.warnings:
@@ -92,7 +98,7 @@ class Captain(commands.Cog):
                             f"{ctx.author.mention} your report has some warnings, "
                             f"it is saved but with those issues:\n{msg}\n"
             ))
-        data.save()
+        await DATA.write(data.save, author=ctx.author.display_name)
 
 
 def setup(bot):
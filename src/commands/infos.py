@@ -1,6 +1,3 @@
-import glob
-import json
-import os.path
 import typing
 
 import discord
@@ -8,11 +5,13 @@ from discord import Embed
 from discord.ext import commands
 
 from src.modules.colors import Color
+from src.modules.data_access import DATA
 from src.modules.game import Game
+from src.modules.game_index import GAMES
 from src.modules.players import SERVER, Leaderboard
-from src.modules.table import Team
+from src.modules.teams import TEAMS
 from src.modules.utils import TeamsList, create_menu, format_time, NormalLeaderboardList, MatchdayList, find_game, \
-    TimeLeaderboardList, TableList, ratio
+    TimeLeaderboardList, TableList, ratio, MatchdaysOverviewList, parse_matchday, PlayerGamesList
 
 
 class Infos(commands.Cog):
@@ -28,8 +27,7 @@ class Infos(commands.Cog):
         Get teams from western: !teams western
         Get teams from conf eastern: !teams eastern
         """
-        with open("resources/teams/teams.json", "r") as f:
-            data = json.load(f)
+        data = TEAMS.by_conf()
         if not conf:
             data = data["western"] + data["eastern"]
         else:
@@ -50,7 +48,7 @@ class Infos(commands.Cog):
             I use: !game 1 ghouls
         """
         teams = " ".join(teams).lower().split(" + ")
-        game = find_game(matchday, *teams)
+        game = await DATA.read(find_game, matchday, *teams)
         team_name = ("ONE", "TWO")
         embed = Embed(color=Color.DEFAULT, title=f"MD: {game['matchday']} {game['title'].upper()}")
         if "team1" in game:
@@ -90,9 +88,9 @@ class Infos(commands.Cog):
 
         Available stats: time, goals, assists, saves, cs, og
         """
-        data = Leaderboard.sort_by(key, conf)
+        version, data = SERVER.versioned(Leaderboard.sort_by, key, conf)
         cls = TimeLeaderboardList if key == "time" else NormalLeaderboardList
-        await create_menu(cls, ctx, data, key=key)
+        await create_menu(cls, ctx, data, key=key, conf=conf, version=version)
 
     @commands.command(aliases=["r", "rlb"])
     async def ratio_leaderboard(self, ctx, key: typing.Literal["time", "goals", "assists", "saves", "cs", "og"],
@@ -104,36 +102,58 @@ class Infos(commands.Cog):
         Min time: the minimum time you want players to have played in order to appear in the leaderboard
         """
 
-        data = [p for p in sorted(Leaderboard.sort_by(key, conf),
-                                  reverse=True,
-                                  key=lambda x: x[1] / x[2] if x[2] != 0 else x[1])
-                if p[2] // 60 >= min_time
-                ]
-        await create_menu(NormalLeaderboardList, ctx, data, key=key)
+        version, data = SERVER.versioned(Leaderboard.sort_by_ratio, key, conf, min_time)
+        await create_menu(NormalLeaderboardList, ctx, data, key=key, conf=conf, version=version,
+                          variant=f"ratio {min_time}")
 
     @commands.command(aliases=["md"])
     async def matchday(self, ctx, matchday: int):
         """Get all results of a matchday."""
-        path = os.path.join("resources/results/", str(matchday))
-        filenames = [filename for filename in glob.glob(f"{path}/*")]
-        data = []
-        for filename in filenames:
-            with open(filename, "r") as f:
-                data.append(json.load(f)["score"])
+        version, games = SERVER.versioned(GAMES.matchday, matchday)
+        data = [game["score"] for game in games]
 
-        await create_menu(MatchdayList, ctx, data, matchday=matchday)
+        await create_menu(MatchdayList, ctx, data, matchday=matchday, version=version)
 
-    @commands.command(aliases=["t"])
-    async def table(self, ctx, conf: typing.Literal["western", "eastern"] = "western"):
-        """See the table of a specific conference.
+    @commands.command(aliases=["mds"])
+    async def matchdays(self, ctx):
+        """See which matchdays are complete.
 
-        """
+        For each matchday: the games played out of the games expected in each conference,
+        and the number of games having warnings."""
+        version, data = SERVER.versioned(GAMES.overview, TEAMS.by_conf())
+        if not data:
+            raise ValueError("Error : No game has been played yet")
 
-        def sort_key(t: Team):
-            return t.points, t.goals_diff, t.goals_for, t.goals_against, t.wins, t.name
+        await create_menu(MatchdaysOverviewList, ctx, data, version=version)
+
+    @commands.command(aliases=["t"])
+    async def table(self, ctx, conf: typing.Literal["western", "eastern"] = "western", matchday: str = None):
+        """See the table of a specific conference.
 
-        data = sorted(SERVER.table(conf).teams.values(), key=lambda t: sort_key(t), reverse=True)
-        await create_menu(TableList, ctx, data)
+        Arrows show the places won or lost during the last matchday.
+        Example:
+            !t western
+            !t western md=7 to see the table right after the matchday 7"""
+        matchday = parse_matchday(matchday)
+        table = SERVER.table(conf)
+        version, (data, moves) = SERVER.versioned(lambda: (table.standings(matchday), table.moves(matchday)))
+        await create_menu(TableList, ctx, data, moves=moves, conf=conf, version=version, variant=matchday)
+
+    async def player_games(self, ctx, name: str, option: str):
+        option, _, n = option.partition(" ")
+        if option not in ("games", "form"):
+            raise ValueError(f"Error : Unknown option --{option}, it must be --games or --form N")
+        version, lines = await DATA.read(SERVER.versioned, SERVER.games.of, name)
+        if not lines:
+            raise ValueError(f"Error : {name} is not in the players list{SERVER.names.did_you_mean(name)}")
+        if option == "form":
+            n = n or "5"
+            if not n.isdigit() or int(n) < 1:
+                raise ValueError(f"Error : {n} is not a number of games")
+            n = int(n)
+            lines = lines[-n:]
+        await create_menu(PlayerGamesList, ctx, lines[::-1], form=option == "form", key=name,
+                          version=version, variant=f"{option} {n}")
 
     def format_player_stats(self, players_stats):
         return f"📊  __**Player Pos:**__\n\n" + \
@@ -141,12 +161,24 @@ class Infos(commands.Cog):
 
     @commands.command(aliases=["s", "stat", "info"])
     async def stats(self, ctx, *, name):
-        """See the stats of a specific player."""
-        name = name.lower()
-        with open("resources/players/players.json") as f:
-            players = json.load(f)
+        """See the stats of a specific player.
+
+        Example:
+            !s anddy
+            !s anddy md=7 to see the stats of anddy right after the matchday 7
+            !s anddy --games to see the stats of anddy in each game
+            !s anddy --form 5 to see the last 5 games of anddy"""
+        name, _, option = name.lower().partition(" --")
+        if option:
+            await self.player_games(ctx, name, option)
+            return
+        name, _, matchday = name.partition(" md=")
+        if matchday:
+            players = await DATA.read(SERVER.history.as_of, parse_matchday(matchday))
+        else:
+            players = SERVER.players.players
         if name not in players:
-            raise ValueError(f"Error : {name} is not in the players list.")
+            raise ValueError(f"Error : {name} is not in the players list{SERVER.names.did_you_mean(name)}")
         player = players[name]
         desc = "```py\n"
         desc += f'{"name":<15} {name:<20} {"stat / mins %":<10}\n'
@@ -158,7 +190,8 @@ class Infos(commands.Cog):
             desc += f'{s:<15} {val:<20} {r}\n'
         desc += "```"
 
-        await ctx.send(embed=Embed(title=name, description=desc).set_footer(text=f"Conference {player['conf']}"))
+        title = f"{name} after matchday {matchday}" if matchday else name
+        await ctx.send(embed=Embed(title=title, description=desc).set_footer(text=f"Conference {player['conf']}"))
 
 
 def setup(bot):
@@ -0,0 +1,161 @@
+import gzip
+import json
+import time
+from typing import Callable
+
+from aiohttp import web
+
+import config
+from src.modules.data_access import DATA
+from src.modules.game_index import GAMES
+from src.modules.players import SERVER, Leaderboard
+from src.modules.teams import TEAMS
+from src.modules.utils import PageCache, find_game
+
+
+class BadParameter(ValueError):
+    """A query or path parameter that can not be used, answered with a 400 instead of a 404."""
+
+
+class StatsApi:
+    """Read-only JSON API over the in-memory stats, served in the bot's event loop.
+
+    Responses carry an ETag made of SERVER.version, so pollers get a 304 until a game or a malus changes,
+    and the bodies are cached per version (and gzipped once for clients accepting it).
+    The versions start again at each run of the bot, the ETag also holds the time the API started.
+    Bodies are built on the reader threads, like the commands' reads.
+    Bad parameters are answered with a 400, unknown conferences, stats, players and games with a 404."""
+    confs = ("western", "eastern")
+    max_per_page = 100
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.epoch = f"{int(time.time()):x}"
+        self.cache = PageCache(config.page_cache_size)
+        self._runner: web.AppRunner = None
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get("/tables/{conf}", self.table),
+            web.get("/leaderboards/{stat}", self.leaderboard),
+            web.get("/matchdays", self.matchdays),
+            web.get("/matchdays/{matchday}", self.matchday),
+            web.get("/players/{name}", self.player),
+            web.get("/games/{matchday}/{team}", self.game),
+        ])
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def table(self, request: web.Request):
+        """/tables/{conf}?md=N: the standings, after matchday N if given."""
+        def build():
+            matchday = _int(request.query.get("md"))
+            conf = request.match_info["conf"]
+            if conf not in StatsApi.confs:
+                raise ValueError(f"Error : {conf} is not a conference")
+            table = SERVER.table(conf)
+            moves = table.moves(matchday)
+            return [dict(team.to_json(), position=i + 1, move=moves.get(team.name))
+                    for i, team in enumerate(table.standings(matchday))]
+
+        return await self._respond(request, build)
+
+    async def leaderboard(self, request: web.Request):
+        """/leaderboards/{stat}?conf=&page=&per_page=&ratio=1&min_time=: a page of (player, stat, time) rows.
+
+        page and per_page are brought back between 1 and max_per_page."""
+        def build():
+            stat, conf = request.match_info["stat"], request.query.get("conf")
+            if conf is not None and conf not in StatsApi.confs:
+                raise BadParameter(f"Error : conf must be one of {', '.join(StatsApi.confs)}")
+            page = max(_int(request.query.get("page")) or 1, 1)
+            per_page = min(max(_int(request.query.get("per_page")) or 20, 1), StatsApi.max_per_page)
+            min_time = max(_int(request.query.get("min_time")) or 0, 0)
+            if request.query.get("ratio"):
+                rows = Leaderboard.sort_by_ratio(stat, conf, min_time)
+            else:
+                rows = Leaderboard.sort_by(stat, conf)
+            start = (page - 1) * per_page
+            return {"total": len(rows), "page": page,
+                    "rows": [{"position": start + i + 1, "player": player, "stat": value, "time": time}
+                             for i, (player, value, time) in enumerate(rows[start:start + per_page])]}
+
+        return await self._respond(request, build)
+
+    async def matchdays(self, request: web.Request):
+        """/matchdays: games played out of the games expected per conference, and warnings, of every matchday."""
+        def build():
+            return [{"matchday": matchday, "played": {conf: {"played": n, "expected": expected}
+                                                      for conf, (n, expected) in done.items()},
+                     "warnings": warned}
+                    for matchday, done, warned in GAMES.overview(TEAMS.by_conf())]
+
+        return await self._respond(request, build)
+
+    async def matchday(self, request: web.Request):
+        """/matchdays/{matchday}: score, conference and warnings of its games."""
+        return await self._respond(request, lambda: GAMES.matchday(_int(request.match_info["matchday"])))
+
+    async def player(self, request: web.Request):
+        """/players/{name}?md=N: the stats of a player, after matchday N if given."""
+        def build():
+            name, matchday = request.match_info["name"].lower(), _int(request.query.get("md"))
+            players = SERVER.players.players if matchday is None else SERVER.history.as_of(matchday)
+            if name not in players:
+                raise ValueError(f"Error : {name} is not in the players list{SERVER.names.did_you_mean(name)}")
+            return dict(players[name], name=name)
+
+        return await self._respond(request, build)
+
+    async def game(self, request: web.Request):
+        """/games/{matchday}/{team}: the whole result, read once per data version."""
+        return await self._respond(request, lambda: find_game(_int(request.match_info["matchday"]),
+                                                        request.match_info["team"]))
+
+    async def _respond(self, request: web.Request, build: Callable[[], object]) -> web.Response:
+        if not SERVER.loaded:
+            await DATA.read(SERVER.ensure_loaded)
+        version = SERVER.version
+        etag = f'W/"{self.epoch}-{version}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        zipped = "gzip" in request.headers.get("Accept-Encoding", "")
+        key = (request.path_qs, zipped, version)
+        body = self.cache.get(key)
+        if body is None:
+            try:
+                body = await DATA.read(_render, build, zipped)
+            except ValueError as e:
+                return web.json_response({"error": str(e).removeprefix("Error : ")},
+                                         status=400 if isinstance(e, BadParameter) else 404)
+            self.cache.put(key, body)
+        if zipped:
+            headers["Content-Encoding"] = "gzip"
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+
+def _render(build: Callable[[], object], zipped: bool) -> bytes:
+    body = json.dumps(build()).encode()
+    return gzip.compress(body) if zipped else body
+
+
+def _int(value: str):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise BadParameter(f"Error : {value} is not a number")
@@ -0,0 +1,60 @@
+from array import array
+
+
+def stat_per_time(stat: int, time: int) -> float:
+    return stat / time if time != 0 else stat
+
+
+class PlayerColumns:
+    """Player aggregates stored column-wise.
+
+    Names are interned to an id, each stat is an array of int64 indexed by that id, so ratios and filters run
+    over whole columns instead of a dict per player. A removed player keeps their id with a zeroed row.
+    The stat / time ratios are kept as columns too, set() updates the row of the player only."""
+    stats = ("time", "goals", "assists", "saves", "cs", "own goals")
+
+    def __init__(self, players: dict = None):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.confs: list[str] = []
+        self.columns: dict[str, array] = {}
+        self.ratio_columns: dict[str, array] = {}
+        self.build(players or {})
+
+    def build(self, players: dict):
+        self.names = list(players)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.confs = [stats["conf"] for stats in players.values()]
+        self.columns = {stat: array("q", [stats[stat] for stats in players.values()]) for stat in PlayerColumns.stats}
+        times = self.columns["time"]
+        self.ratio_columns = {stat: array("d", map(stat_per_time, column, times))
+                              for stat, column in self.columns.items()}
+
+    def set(self, name: str, stats: dict = None):
+        """Write the row of one player, stats=None when the player is gone."""
+        i = self.ids.get(name)
+        if i is None:
+            if stats is None:
+                return
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.confs.append(stats["conf"])
+            for stat, column in self.columns.items():
+                column.append(stats[stat])
+                self.ratio_columns[stat].append(stat_per_time(stats[stat], stats["time"]))
+            return
+        self.confs[i] = stats["conf"] if stats is not None else None
+        for stat, column in self.columns.items():
+            column[i] = stats[stat] if stats is not None else 0
+            self.ratio_columns[stat][i] = stat_per_time(stats[stat], stats["time"]) if stats is not None else 0
+
+    def row(self, name: str, key: str) -> tuple[str, int, int]:
+        i = self.ids[name]
+        return name, self.columns[key][i], self.columns["time"][i]
+
+    def ratios(self, key: str) -> array:
+        """stat / time of every player, stat alone for players without time."""
+        return self.ratio_columns[key]
+
+    def __len__(self):
+        return len(self.names)
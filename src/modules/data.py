@@ -1,12 +1,15 @@
-import json
-import os
+import copy
 import re
 from collections import Counter
 from dataclasses import dataclass
 
 from src.modules import aliases
-from src.modules.json_encoder import EnhancedJSONEncoder
+from src.modules.events import EVENTS, REPORT_CREATED, REPORT_EDITED, SCORE_EDITED
+from src.modules.game_index import GAMES
+from src.modules.names import NameIndex
 from src.modules.players import SERVER
+from src.modules.storage import STORAGE
+from src.modules.teams import TEAMS
 from src.modules.utils import clean_rec, game_exists
 
 
@@ -21,17 +24,15 @@ class Data:
         self.errors = []
         if data is None:
             self._data = {"warnings": []}
+            self._saved = None
         else:
             self._data = data
+            self._saved = copy.deepcopy(data)
 
     @property
     def discord_infos(self):
         return self._data["discord_infos"]
 
-    @property
-    def full_path(self):
-        return os.path.join(f"resources/results", f"{self._data['matchday']}/", f"{self._data['title']}.json")
-
     @property
     def warnings(self):
         return self._data["warnings"]
@@ -64,8 +65,10 @@ class Data:
         elif player in self._data["team2"]["time_played"]:
             team = "team2"
         else:
+            # may be a substitute as well as a typo, the warning shows the close names to check
+            suggestions = self._players_index().did_you_mean(player)
             self.warn(f"{player} {stat} {stat_name} was added to the game in team 1 "
-                      f"whereas {player} was not in at first.")
+                      f"whereas {player} was not in at first{suggestions or '.'}")
             team = "team1"
 
         self._data[team][stat_name][player] = stat
@@ -80,12 +83,12 @@ class Data:
         self._check_match_does_not_exist()
         self._prepare_stats()
 
-    def edit_score(self, team1, team2, score_team1, score_team2):
+    def edit_score(self, team1, team2, score_team1, score_team2, author: str = None):
         self._check_arg_in_team_scores(team1)
         self._check_arg_in_team_scores(team2)
         self._data["score"] = {team1: score_team1, team2: score_team2}
         self._data["title"] = f"{team1} {score_team1} - {score_team2} {team2}"
-        self.save()
+        self.save(SCORE_EDITED, author)
 
     def update_nick(self, nickname_in_match, real_nickname):
         if nickname_in_match in self._data["team1"]["time_played"]:
@@ -93,7 +96,8 @@ class Data:
         elif nickname_in_match in self._data["team2"]["time_played"]:
             team = "team2"
         else:
-            raise ValueError(f"Error : {nickname_in_match} is not in the game.")
+            raise ValueError(f"Error : {nickname_in_match} is not in the game"
+                             f"{self._players_index().did_you_mean(nickname_in_match)}")
 
         for stat_name, stats in self._data[team].items():
             if nickname_in_match in stats:
@@ -102,11 +106,39 @@ class Data:
                 stats[real_nickname] += stats[nickname_in_match]
                 stats.pop(nickname_in_match)
 
-    def save(self):
-        os.makedirs(os.path.dirname(self.full_path), exist_ok=True)
-        with open(self.full_path, "w+") as f:
-            json.dump(self.data, f, indent=4, cls=EnhancedJSONEncoder)
-        SERVER.update()
+    def save(self, kind: str = None, author: str = None):
+        """Store the game and apply what changed since the version stored, kind is the event logged.
+
+        The stored version is read again rather than trusting the copy this game was read from,
+        which is stale if someone else edited the game meanwhile."""
+        # loaded before the results change, or a first load would count this game twice
+        SERVER.ensure_loaded()
+        stored = self._stored()
+        kind = kind or (REPORT_CREATED if stored is None else REPORT_EDITED)
+        EVENTS.record_game(kind, self.data, stored, author)
+        if stored is not None:
+            if (stored["matchday"], stored["title"]) != (self._data["matchday"], self.title):
+                STORAGE.delete_game(stored["matchday"], stored["title"])
+            GAMES.remove(stored)
+        STORAGE.save_game(self.data)
+        GAMES.add(self.data)
+        SERVER.apply(self.data, stored)
+        self._saved = copy.deepcopy(self.data)
+
+    def _stored(self):
+        """The version of this game currently stored, None for a new game."""
+        game = self._saved or self._data
+        titles = {GAMES.title(game["matchday"], team) for team in game["score"]} - {None}
+        if not titles:
+            return None
+        try:
+            return STORAGE.load_game(game["matchday"], titles.pop())
+        except ValueError:
+            return None
+
+    def _players_index(self) -> NameIndex:
+        """Index of the nicknames of this game."""
+        return NameIndex(list(self._data["team1"]["time_played"]) + list(self._data["team2"]["time_played"]))
 
     def _check_match_does_not_exist(self):
         if game_exists(self._data["matchday"], *self._data["score"].keys()):
@@ -115,30 +147,30 @@ class Data:
     def _get_matchday(self, infos: list[str]):
         try:
             matchday = [line for line in infos if "matchday" in line]
-            self._data["matchday"] = int(re.findall(r".*(\d+).*", matchday[0])[0])
+            self._data["matchday"] = int(re.findall(r"\d+", matchday[0])[0])
         except (IndexError, ValueError):
             raise ValueError("Error : The match day is missing or incorrect, please follow the format: `matchday N`")
 
     def _get_score(self, infos: list[str]):
-        with open("resources/teams/teams.json") as f:
-            teams = json.load(f)
-            all_teams = teams["western"] + teams["eastern"]
-        try:
-            score = [line for line in infos if any(team in line for team in all_teams)][0]
-            score = re.split(r" +(\d+).*(\d+) +", score)
-            for i in range(len(score)):
-                for team in all_teams:
-                    if team in score[i]:
-                        score[i] = team
-            args_score = score[0], int(score[1]), int(score[2]), score[3]
-            self._data["score"] = {args_score[0]: args_score[1], args_score[3]: args_score[2]}
-            self._data["title"] = f"{args_score[0]} {args_score[1]} - {args_score[2]} {args_score[3]}"
-            self._data["conf"] = "western" if args_score[0] in teams["western"] else "eastern"
-        except Exception:
-            self._data["score"] = "Unknown"
-            self._data["title"] = "Unknown"
-            self._data["conf"] = "Unknown"
-            raise ValueError("Error : Can not find 2 teams in your message, make sure they are in !teams")
+        """Read the first line naming two teams: team1 N - M team2."""
+        error = "Error : Can not find 2 teams in your message, make sure they are in !teams"
+        for line in infos:
+            matches = TEAMS.find_all(line)
+            if len({match.team for match in matches}) < 2:
+                continue
+            goals = re.findall(r"\d+", line[matches[0].end:matches[-1].start])
+            if len(matches) == 2 and len(goals) == 2:
+                (team1, team2), (score1, score2) = [match.team for match in matches], map(int, goals)
+                self._data["score"] = {team1: score1, team2: score2}
+                self._data["title"] = f"{team1} {score1} - {score2} {team2}"
+                self._data["conf"] = TEAMS.conf(team1)
+                return
+            error = f"Error : Could not read the score line, expected `team1 N - M team2`, found: {line}"
+            break
+        self._data["score"] = "Unknown"
+        self._data["title"] = "Unknown"
+        self._data["conf"] = "Unknown"
+        raise ValueError(error)
 
 
     def _get_rec(self, infos: list[str]):
@@ -155,7 +187,8 @@ class Data:
                 f"Missing {2 - len(discord_embed_results)} result report from #report-official")
         self._data["discord_infos"] = discord_embed_results
 
-    def _sum_merge(self, *halves):
+    @staticmethod
+    def _sum_merge(*halves):
         if len(halves) == 0:
             return {}
         elif len(halves) == 1:
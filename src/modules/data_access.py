@@ -0,0 +1,34 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import config
+
+
+class DataAccess:
+    """Run the blocking storage work of the commands off the event loop.
+
+    Reads go to a pool of threads. Writes, anything storing results, malus or aggregates, go to a single writer
+    thread, so they run one at a time and in the order the commands asked for them.
+    The context is carried along, so the time spent is still counted in the command's metrics."""
+
+    def __init__(self, readers: int):
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="data-read")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="data-write")
+
+    async def read(self, function: Callable, *args, **kwargs):
+        return await DataAccess._run(self._readers, function, *args, **kwargs)
+
+    async def write(self, function: Callable, *args, **kwargs):
+        return await DataAccess._run(self._writer, function, *args, **kwargs)
+
+    @staticmethod
+    async def _run(pool: ThreadPoolExecutor, function: Callable, *args, **kwargs):
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, function, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+
+
+DATA = DataAccess(config.read_threads)
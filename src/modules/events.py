@@ -0,0 +1,173 @@
+import datetime
+import json
+import os
+
+from src.modules.files import atomic_write_json
+from src.modules.json_encoder import EnhancedJSONEncoder
+from src.modules.storage import STORAGE
+
+REPORT_CREATED = "report created"
+REPORT_EDITED = "report edited"
+RECS_EDITED = "recs edited"
+STAT_EDITED = "stat edited"
+NICK_EDITED = "nick edited"
+SCORE_EDITED = "score edited"
+GAME_DELETED = "game deleted"
+MALUS_ADDED = "malus added"
+
+
+class EventLog:
+    """Append-only log of every mutation of the results and malus, written before the mutation itself.
+
+    Events carry the new state of what they change (the whole game, the new malus), so applying one twice is harmless.
+    A snapshot of all the results and malus is taken by compact(), the log then only holds the events after it and
+    the compacted events are kept under archive/ for the audit trail.
+    The results can be rebuilt with replay(): the snapshot, then the events after it."""
+    path = "resources/events"
+
+    def __init__(self):
+        self._seq: int = None
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(EventLog.path, "events.log")
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(EventLog.path, "snapshot.json")
+
+    @property
+    def seq(self) -> int:
+        """Number of the last event recorded."""
+        if self._seq is None:
+            events = list(self.events())
+            self._seq = events[-1]["seq"] if events else self._snapshot_seq()
+            self._truncate_torn_line()
+        return self._seq
+
+    def record(self, kind: str, author: str = None, **payload):
+        if not os.path.exists(self.snapshot_path):
+            # the first snapshot is the starting point of the log
+            self.compact()
+        event = {"seq": self.seq + 1, "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "kind": kind, "author": author, **payload}
+        os.makedirs(EventLog.path, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as log:
+            log.write(json.dumps(event, cls=EnhancedJSONEncoder) + "\n")
+            log.flush()
+            os.fsync(log.fileno())
+        self._seq = event["seq"]
+
+    def record_game(self, kind: str, game: dict, old_game: dict = None, author: str = None):
+        old = None if old_game is None else {"matchday": old_game["matchday"], "title": old_game["title"]}
+        self.record(kind, author, game=game, old=old)
+
+    def record_delete(self, game: dict, author: str = None):
+        self.record(GAME_DELETED, author, matchday=game["matchday"], title=game["title"])
+
+    def record_malus(self, conf: str, team: str, malus: int, author: str = None):
+        self.record(MALUS_ADDED, author, conf=conf, team=team, malus=malus)
+
+    def events(self, after: int = 0):
+        """Events of the log with a seq greater than after, a torn last line is ignored."""
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if event["seq"] > after:
+                        yield event
+        except FileNotFoundError:
+            return
+
+    def compact(self):
+        """Snapshot the results and malus, and archive the events it includes."""
+        seq = self.seq
+        snapshot = {"seq": seq, "games": list(STORAGE.games()), "malus": STORAGE.load_malus()}
+        atomic_write_json(self.snapshot_path, snapshot)
+        if os.path.exists(self.log_path):
+            first = next(self.events(), {"seq": seq})["seq"]
+            os.makedirs(os.path.join(EventLog.path, "archive"), exist_ok=True)
+            os.replace(self.log_path, os.path.join(EventLog.path, "archive", f"events-{first}-{seq}.log"))
+
+    def replay(self) -> tuple[dict[tuple[int, str], dict], dict]:
+        """Results by (matchday, title) and malus as of the last event: the snapshot plus the events after it."""
+        games, malus = {}, STORAGE.load_malus()
+        seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            games = {(game["matchday"], game["title"]): game for game in snapshot["games"]}
+            malus, seq = snapshot["malus"], snapshot["seq"]
+        for event in self.events(after=seq):
+            if "game" in event:
+                if event["old"] is not None:
+                    games.pop((event["old"]["matchday"], event["old"]["title"]), None)
+                games[(event["game"]["matchday"], event["game"]["title"])] = event["game"]
+            elif event["kind"] == GAME_DELETED:
+                games.pop((event["matchday"], event["title"]), None)
+            elif event["kind"] == MALUS_ADDED:
+                malus[event["conf"]][event["team"]] = event["malus"]
+        return games, malus
+
+    def restore(self):
+        """Make the stored results and malus what the replay says."""
+        games, malus = self.replay()
+        for game in list(STORAGE.games()):
+            if (game["matchday"], game["title"]) not in games:
+                STORAGE.delete_game(game["matchday"], game["title"])
+        STORAGE.save_games(list(games.values()))
+        STORAGE.save_malus(malus)
+
+    def recover(self) -> bool:
+        """Apply the last event again if the bot stopped before storing it, return True if it had to."""
+        event = next(self.events(after=self.seq - 1), None)
+        if event is None:
+            return False
+        if "game" in event:
+            game, old = event["game"], event["old"]
+            moved = old is not None and (old["matchday"], old["title"]) != (game["matchday"], game["title"])
+            if self._stored(game["matchday"], game["title"]) == game and \
+                    not (moved and self._stored(old["matchday"], old["title"]) is not None):
+                return False
+            if moved:
+                STORAGE.delete_game(old["matchday"], old["title"])
+            STORAGE.save_game(game)
+        elif event["kind"] == GAME_DELETED:
+            if self._stored(event["matchday"], event["title"]) is None:
+                return False
+            STORAGE.delete_game(event["matchday"], event["title"])
+        elif event["kind"] == MALUS_ADDED:
+            malus = STORAGE.load_malus()
+            if malus[event["conf"]][event["team"]] == event["malus"]:
+                return False
+            malus[event["conf"]][event["team"]] = event["malus"]
+            STORAGE.save_malus(malus)
+        return True
+
+    @staticmethod
+    def _stored(matchday: int, title: str):
+        try:
+            return STORAGE.load_game(matchday, title)
+        except ValueError:
+            return None
+
+    def _truncate_torn_line(self):
+        """Drop what a crash left of an event written halfway, so the next event starts on its own line."""
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "rb+") as log:
+            content = log.read()
+            if content and not content.endswith(b"\n"):
+                log.truncate(content.rfind(b"\n") + 1)
+
+    def _snapshot_seq(self) -> int:
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        with open(self.snapshot_path, "r") as f:
+            return json.load(f)["seq"]
+
+
+EVENTS = EventLog()
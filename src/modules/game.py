@@ -19,75 +19,84 @@ class Game:
         "own goals": "og"
     }
 
+    player_line = re.compile(r"> \*\*(?P<name>.+?):\*\* (?P<stats>.*)")
+    token = re.compile(r"(?P<min>\d+)m(?:(?P<min_sec>\d+)sec)?|(?P<sec>\d+)sec|(?P<n>\d+)(?P<stat>og|cs|g|a|s)\b")
+    time_token = re.compile(r"(?:(?P<min>\d+)m)?(?:(?P<sec>\d+)sec)?")
+    max_seconds = 420
+
     @staticmethod
     def parse(text: str, switched_team=False):
-        def find_players(txt: list[str]):
-            res = []
-            for e in txt:
-                if e.startswith(">"):
-                    res.append(e[4:].lower().split(":** "))
-                elif e == "SEPARATOR":
-                    res.append(e)
-            return res
-
-        t = text.splitlines()
-        t = find_players(t)
-        separator = t.index("SEPARATOR")
-
-        team1 = {x for x, y in t[:separator]} if not switched_team else {x for x, y in t[separator + 1:]}
-        t.pop(separator)
-        # t = [s[4:].lower().split(":** ") for s in t if s.startswith(">")]
-        for elem in t:
-            if elem[0].startswith("[og] "):
-                elem[0] = elem[0].replace("[og] ", "")
-                elem[1] = elem[1].replace("g", "og")
-        try:
-            t = [(x, *y.split(" ")) for x, y in t]
-        except ValueError:
-            return
-        d = {}
-        for name, *stats in t:
-            if name in d:
-                d[name] += stats
-            else:
-                d[name] = stats
-        if len(d) <= 7:
-            return
+        """Parse one half report, the two sides being separated by a SEPARATOR line.
 
-        game = {"team1": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}},
-                "team2": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}}}
-        for name, stats in d.items():
-            for stat in stats:
-                if Game.is_time(stat):
-                    number, stat_name = Game.calculate_seconds(stat), Game.stat_match["m"]
+        Each player line looks like `> **name:** 7m 1g 2a 3s`, `[og] name` lines count their goals as own goals.
+        Raise a ParseError pointing to the line when the report can not be understood."""
+        players: dict[str, list[tuple[str, int]]] = {}
+        team1 = set()
+        first_side = not switched_team
+        separator_found = False
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if line == "SEPARATOR":
+                if separator_found:
+                    raise ParseError(line_number, "the report has more than one SEPARATOR")
+                separator_found = True
+                first_side = not first_side
+                continue
+            if not line.startswith(">"):
+                continue
+            match = Game.player_line.match(line.lower())
+            if match is None:
+                raise ParseError(line_number, "expected `> **name:** stats`", line)
+
+            name, own_goal = match["name"], False
+            if name.startswith("[og] "):
+                name, own_goal = name[5:], True
+            elif first_side:
+                team1.add(name)
+            stats = players.setdefault(name, [])
+            for token in Game.token.finditer(match["stats"]):
+                if token["stat"] is None:
+                    seconds = int(token["min"] or 0) * 60 + int(token["min_sec"] or token["sec"] or 0)
+                    stats.append(("time_played", min(seconds, Game.max_seconds)))
                 else:
-                    number_stat_name = re.findall(r"\d+|\w+", stat)
+                    stat = "og" if own_goal and token["stat"] == "g" else token["stat"]
+                    stats.append((Game.stat_match[stat], int(token["n"])))
 
-                    try:
-                        number, stat_name = int(number_stat_name[0]), Game.stat_match[number_stat_name[1]]
-                    except KeyError:
-                        continue
-                team = "team1" if name in team1 else "team2"
-                game[team][stat_name][name] = number
+        if not separator_found:
+            raise ParseError(0, "the report has no SEPARATOR between the two teams")
+        if len(players) <= 7:
+            raise ParseError(0, f"only {len(players)} players found in the report")
 
+        game = {"team1": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}},
+                "team2": {"time_played": {}, "scorers": {}, "assisters": {}, "cs": {}, "saves": {}, "own goals": {}}}
+        for name, stats in players.items():
+            team = game["team1"] if name in team1 else game["team2"]
+            for stat_name, number in stats:
+                team[stat_name][name] = number
         return game
 
     @staticmethod
     def calculate_seconds(time) -> int:
-        if "m" in time:
-            if 'sec' in time:
-                time = time.replace("m", " * 60 + ").replace("sec", "")
-            else:
-                time = time.replace("m", " * 60")
-        else:
-            time = time.replace("sec", "")
-        res = eval(time)
-        return min(res, 420)
+        match = Game.time_token.fullmatch(time)
+        if match is None or not time:
+            raise ValueError(f"Error : {time} is not a valid time, expected something like 6m12sec")
+        return min(int(match["min"] or 0) * 60 + int(match["sec"] or 0), Game.max_seconds)
 
     @staticmethod
     def is_time(val):
         return "m" in val or "sec" in val
 
+
+class ParseError(ValueError):
+    """A report that can not be parsed, line is 1-based (0 when the whole report is wrong)."""
+
+    def __init__(self, line: int, reason: str, text: str = ""):
+        self.line = line
+        self.reason = reason
+        self.text = text
+        where = f"line {line}: " if line else ""
+        super().__init__(f"Error : Could not parse the report, {where}{reason}" + (f" `{text}`" if text else ""))
+
+
 # if __name__ == '__main__':
 #     sample_game = open("../../resources/raw/26-01-22-21h17-JSadvsTheGoal.hbr2.txt", encoding="utf-8").read()
 #     # data = construct_match_data(sample_text)
@@ -0,0 +1,137 @@
+from src.modules.persistence import WRITE_BEHIND
+from src.modules.storage import STORAGE, game_summary
+from src.modules.teams import TEAMS
+
+
+class GameIndex:
+    """Persistent index (matchday, canonical team) -> title of the result, stored through STORAGE.
+
+    Also keeps a summary (score, conference, warnings) of every game per matchday, so that
+    !matchday, !matchdays and !warnings never read the results.
+    The writer thread changes it while the commands read it, both hold WRITE_BEHIND.lock."""
+
+    def __init__(self, index: dict = None, matchdays: dict = None):
+        self._index: dict[str, dict[str, str]] = index
+        self._matchdays: dict[str, dict[str, dict]] = matchdays
+
+    @property
+    def index(self) -> dict[str, dict[str, str]]:
+        if self._index is None:
+            self._load()
+        return self._index
+
+    @property
+    def matchdays(self) -> dict[str, dict[str, dict]]:
+        """matchday -> title -> {matchday, score, conf, warnings} of every game."""
+        if self._matchdays is None:
+            self._load()
+        return self._matchdays
+
+    def _load(self):
+        loaded = STORAGE.load_game_index()
+        if loaded is None:
+            self.rebuild()
+        else:
+            self._index, self._matchdays = loaded
+
+    def rebuild(self):
+        fresh = GameIndex({}, {})
+        for game in STORAGE.games():
+            fresh.apply(game)
+        self.replace(fresh)
+
+    def apply(self, game: dict):
+        """Index game without saving, for an index being built aside."""
+        self._add(self._index, game)
+        self._add_summary(self._matchdays, game)
+
+    def replace(self, other: "GameIndex"):
+        """Take the content of an index built aside, the readers see either the old or the new one."""
+        with WRITE_BEHIND.lock:
+            self._index, self._matchdays = other._index, other._matchdays
+            self.save()
+
+    def add(self, game: dict):
+        with WRITE_BEHIND.lock:
+            self._add(self.index, game)
+            self._add_summary(self.matchdays, game)
+            self.save()
+
+    def remove(self, game: dict):
+        with WRITE_BEHIND.lock:
+            matchday = self.index.get(str(game["matchday"]), {})
+            for team in game["score"]:
+                if matchday.get(team) == game["title"]:
+                    matchday.pop(team)
+            summaries = self.matchdays.get(str(game["matchday"]), {})
+            summaries.pop(game["title"], None)
+            if not summaries:
+                self.matchdays.pop(str(game["matchday"]), None)
+            self.save()
+
+    def title(self, matchday: int, team: str):
+        with WRITE_BEHIND.lock:
+            return self.index.get(str(matchday), {}).get(team)
+
+    def find(self, matchday: int, *teams) -> str:
+        """Return the title of the only game of matchday played by one of the teams."""
+        titles = {self.title(matchday, TEAMS.resolve(team)) for team in teams} - {None}
+        if len(titles) > 1:
+            raise ValueError(f"Error : Found more than one match with matchday: {matchday} and team(s) {teams}")
+        if not titles:
+            raise ValueError(f"Error : Could not find a match with matchday: {matchday} and team(s) {teams}")
+        return titles.pop()
+
+    def matchday(self, matchday: int) -> list[dict]:
+        """Summaries of the games of a matchday."""
+        with WRITE_BEHIND.lock:
+            return list(self.matchdays.get(str(matchday), {}).values())
+
+    def games_with_warnings(self, matchday: int = None, team: str = None) -> list[dict]:
+        """Games having warnings, sorted by matchday, optionally for one matchday and/or a team (or part of it)."""
+        with WRITE_BEHIND.lock:
+            matchdays = sorted(int(md) for md in self.matchdays) if matchday is None else [matchday]
+            games = [game for md in matchdays for game in self.matchday(md) if game["warnings"]]
+        if team is not None:
+            team = team.lower().strip()
+            games = [game for game in games if any(team in name for name in game["score"])]
+        return games
+
+    def overview(self, teams: dict[str, list[str]]) -> list[tuple[int, dict[str, tuple[int, int]], int]]:
+        """For every matchday up to the last one played: (matchday, conf -> (games played, games expected),
+        number of games having warnings)."""
+        with WRITE_BEHIND.lock:
+            last = max((int(md) for md in self.matchdays), default=0)
+            games = {matchday: self.matchday(matchday) for matchday in range(1, last + 1)}
+        overview = []
+        for matchday in range(1, last + 1):
+            done = {conf: (sum(game["conf"] == conf for game in games[matchday]), len(conf_teams) // 2)
+                    for conf, conf_teams in teams.items()}
+            overview.append((matchday, done, sum(bool(game["warnings"]) for game in games[matchday])))
+        return overview
+
+    @staticmethod
+    def _add(index: dict, game: dict):
+        if not isinstance(game.get("score"), dict):
+            return
+        matchday = index.setdefault(str(game["matchday"]), {})
+        for team in game["score"]:
+            matchday[team] = game["title"]
+
+    @staticmethod
+    def _add_summary(matchdays: dict, game: dict):
+        if not isinstance(game.get("score"), dict):
+            return
+        matchdays.setdefault(str(game["matchday"]), {})[game["title"]] = game_summary(game)
+
+    def save(self):
+        """Write the index behind, a burst of edits ends up in a single write."""
+        WRITE_BEHIND.schedule("game index", self._capture)
+
+    def _capture(self):
+        index = {matchday: dict(teams) for matchday, teams in self._index.items()}
+        matchdays = {matchday: dict(games) for matchday, games in self._matchdays.items()}
+        return lambda: STORAGE.save_game_index(index, matchdays)
+
+
+GAMES = GameIndex()
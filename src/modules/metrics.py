@@ -0,0 +1,143 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+
+from src.modules.files import atomic_write_json
+
+
+class Histogram:
+    """Latencies in milliseconds, counted in fixed buckets."""
+    bounds = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(Histogram.bounds) + 1)
+
+    def observe(self, ms: float):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.buckets[bisect.bisect_left(Histogram.bounds, ms)] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile, capped by the max."""
+        rank, seen = p / 100 * self.count, 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(Histogram.bounds[i], self.max) if i < len(Histogram.bounds) else self.max
+        return 0.0
+
+    def to_json(self):
+        return {"count": self.count, "total_ms": round(self.total, 3), "max_ms": round(self.max, 3),
+                "p50_ms": self.percentile(50), "p95_ms": self.percentile(95),
+                "buckets": dict(zip([*map(str, Histogram.bounds), "inf"], self.buckets))}
+
+
+class CommandMetrics:
+    def __init__(self):
+        self.total = Histogram()
+        self.spans: dict[str, Histogram] = {}
+
+    def to_json(self):
+        return {"total": self.total.to_json(), "spans": {name: h.to_json() for name, h in self.spans.items()}}
+
+
+class Metrics:
+    """Per-command latency histograms, with sub-spans (io, parsing, server update, discord) inside each command.
+
+    The running command is tracked in a context variable, so spans are attributed to the command whose task they
+    run in. Spans outside of any command are recorded under "-"."""
+
+    def __init__(self):
+        self.commands: dict[str, CommandMetrics] = {}
+        self._command = contextvars.ContextVar("command", default=None)
+
+    def start_command(self, name: str):
+        self._command.set((name, time.perf_counter()))
+
+    def end_command(self):
+        current = self._command.get()
+        if current is None:
+            return
+        name, start = current
+        self.command(name).total.observe((time.perf_counter() - start) * 1000)
+        self._command.set(None)
+
+    def record(self, name: str, ms: float):
+        """Record a duration that is not a command run, like the startup."""
+        self.command(name).total.observe(ms)
+
+    def command(self, name: str) -> CommandMetrics:
+        if name not in self.commands:
+            self.commands[name] = CommandMetrics()
+        return self.commands[name]
+
+    def observe_span(self, span: str, ms: float):
+        current = self._command.get()
+        spans = self.command(current[0] if current is not None else "-").spans
+        if span not in spans:
+            spans[span] = Histogram()
+        spans[span].observe(ms)
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_span(name, (time.perf_counter() - start) * 1000)
+
+    def timed(self, name: str):
+        """Decorator recording every call as a span, generators are timed while they are iterated."""
+
+        def decorator(function):
+            if inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def generator_wrapper(*args, **kwargs):
+                    iterator, elapsed = function(*args, **kwargs), 0.0
+                    try:
+                        while True:
+                            start = time.perf_counter()
+                            try:
+                                item = next(iterator)
+                            finally:
+                                elapsed += time.perf_counter() - start
+                            yield item
+                    except StopIteration:
+                        return
+                    finally:
+                        self.observe_span(name, elapsed * 1000)
+
+                return generator_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def instrument(self, obj, name: str):
+        """Time every public method of obj as a span called name."""
+        for attribute in dir(type(obj)):
+            method = getattr(obj, attribute)
+            if not attribute.startswith("_") and callable(method):
+                setattr(obj, attribute, self.timed(name)(method))
+        return obj
+
+    def to_json(self):
+        return {name: command.to_json() for name, command in sorted(self.commands.items())}
+
+    def dump(self, path: str):
+        atomic_write_json(path, self.to_json(), indent=4)
+
+
+METRICS = Metrics()
@@ -0,0 +1,51 @@
+from collections import Counter, defaultdict
+from typing import Iterable
+
+from src.modules.persistence import WRITE_BEHIND
+
+
+class NameIndex:
+    """Trigram index of player names, answers "did you mean" without scanning every name."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self._grams: dict[str, set[str]] = defaultdict(set)
+        self._names: dict[str, set[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def trigrams(name: str) -> set[str]:
+        padded = f"  {name} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name: str):
+        if name in self._names:
+            return
+        self._names[name] = NameIndex.trigrams(name)
+        for gram in self._names[name]:
+            self._grams[gram].add(name)
+
+    def remove(self, name: str):
+        for gram in self._names.pop(name, ()):
+            self._grams[gram].discard(name)
+            if not self._grams[gram]:
+                self._grams.pop(gram)
+
+    def search(self, query: str, limit: int = 5, threshold: float = 0.3) -> list[str]:
+        """Names sharing the most trigrams with the query (Jaccard similarity >= threshold), best first."""
+        grams = NameIndex.trigrams(query)
+        with WRITE_BEHIND.lock:
+            shared = Counter(name for gram in grams for name in self._grams.get(gram, ()))
+            scores = [(n / (len(grams) + len(self._names[name]) - n), name) for name, n in shared.items()]
+        return [name for score, name in sorted(scores, key=lambda s: (-s[0], s[1])) if score >= threshold][:limit]
+
+    def did_you_mean(self, query: str) -> str:
+        """Suggestions to append to an error message, empty when no name is close."""
+        candidates = self.search(query)
+        return f", did you mean: {', '.join(candidates)} ?" if candidates else ""
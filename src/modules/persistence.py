@@ -0,0 +1,49 @@
+import atexit
+import threading
+from typing import Callable
+
+import config
+
+
+class WriteBehind:
+    """Coalesce the writes of the aggregates and flush them at most every interval seconds.
+
+    Scheduling the same key again before the flush replaces the pending write, so a burst of edits ends up in a
+    single write. Code mutating what a pending write reads must hold the lock.
+    A pending write is a capture: called under the lock, it copies what it needs and returns the actual write,
+    which serializes and writes outside of the lock so that the readers are not blocked by the disk."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.RLock()
+        # keeps the writes of two flushes in order, without blocking the readers
+        self._flushing = threading.Lock()
+        self._pending: dict[str, Callable[[], Callable[[], None]]] = {}
+        self._timer: threading.Timer = None
+        atexit.register(self.flush)
+
+    def schedule(self, key: str, capture: Callable[[], Callable[[], None]]):
+        with self.lock:
+            self._pending[key] = capture
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._flushing:
+            with self.lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending, self._pending = self._pending, {}
+                writes = [capture() for capture in pending.values()]
+            for write in writes:
+                write()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+WRITE_BEHIND = WriteBehind(config.flush_interval)
@@ -1,8 +1,21 @@
+import bisect
+import copy
 import datetime
-import glob
 import json
-
+import struct
+from collections.abc import Sequence
+from typing import Callable, NamedTuple
+
+import config
+from src.modules.columns import PlayerColumns, stat_per_time
+from src.modules.game_index import GAMES, GameIndex
+from src.modules.metrics import METRICS
+from src.modules.names import NameIndex
+from src.modules.persistence import WRITE_BEHIND
+from src.modules.snapshot import Snapshot, write_snapshot
+from src.modules.storage import STORAGE
 from src.modules.table import Table
+from src.modules.teams import TEAMS
 
 
 class Matching:
@@ -25,28 +38,129 @@ class Matching:
 
 
 class Updater:
-    def __init__(self):
-        self.players_db = {}
+    def __init__(self, players_db: dict = None):
+        self.players_db = {} if players_db is None else players_db
+
+    def update_all(self, *consumers: Callable[[dict], None]):
+        """Rebuild the aggregates from the results, each game is also given to the consumers."""
+        self.players_db.clear()
+        for game in STORAGE.games():
+            self.add_game(game)
+            for consume in consumers:
+                consume(game)
+
+        STORAGE.save_players(self.players_db)
+
+    def add_game(self, game: dict, sign: int = 1):
+        """Add (or subtract with sign=-1) the stats of one game to the players aggregates."""
+        if "team1" not in game:
+            return
+
+        for team in ("team1", "team2"):
+            for stat, players in game[team].items():
+                convert_to_player_stat = Matching.game_to_player[stat]
+                for player, n in players.items():
+                    if player not in self.players_db:
+                        self.players_db[player] = {stat: 0 for stat in Matching.player_to_game}
+                        self.players_db[player]["conf"] = game["conf"]
+                    self.players_db[player][convert_to_player_stat] += sign * n
 
-    def update_all(self):
-        json.dump({}, open("resources/players/players.json", "w+"))
-        for filename in glob.glob("resources/results/*/*.json"):
-            with open(filename, "r") as f:
-                game: dict = json.load(f)
-                if "team1" not in game:
-                    continue
-
-                for team in ("team1", "team2"):
-                    for stat, players in game[team].items():
-                        convert_to_player_stat = Matching.game_to_player[stat]
-                        for player, n in players.items():
-                            if player not in self.players_db:
-                                self.players_db[player] = {stat: 0 for stat in Matching.player_to_game}
-                                self.players_db[player]["conf"] = game["conf"]
-                            self.players_db[player][convert_to_player_stat] += n
+    @staticmethod
+    def players_of(game: dict) -> set[str]:
+        if "team1" not in game:
+            return set()
+        return {player for team in ("team1", "team2") for players in game[team].values() for player in players}
+
+    def remove_game(self, game: dict):
+        """Subtract the stats of one game, players left without any stat are dropped."""
+        self.add_game(game, sign=-1)
+        for player in Updater.players_of(game):
+            stats = self.players_db.get(player)
+            if stats is not None and not any(stats[stat] for stat in Matching.player_to_game):
+                self.players_db.pop(player)
+
+
+class PlayerHistory:
+    """Players stats of each matchday, summed into the players as of a matchday.
+
+    The per-matchday stats are saved in the server snapshot like the tables, so a historical query never reads
+    the results; update() rebuilds them in its pass over the results."""
+
+    def __init__(self, matchdays: dict[int, dict] = None):
+        self.matchdays: dict[int, dict] = {} if matchdays is None else matchdays
+        self._as_of: dict[int, dict] = {}
+
+    def as_of(self, matchday: int) -> dict:
+        with WRITE_BEHIND.lock:
+            if matchday not in self._as_of:
+                start = max((md for md in self._as_of if md < matchday), default=None)
+                players = {} if start is None else copy.deepcopy(self._as_of[start])
+                for md in sorted(md for md in self.matchdays if (start is None or md > start) and md <= matchday):
+                    for player, stats in self.matchdays[md].items():
+                        total = players.setdefault(player, {stat: 0 for stat in Matching.player_to_game})
+                        total["conf"] = stats["conf"]
+                        for stat in Matching.player_to_game:
+                            total[stat] += stats[stat]
+                self._as_of[matchday] = players
+            return self._as_of[matchday]
+
+    def apply(self, game: dict = None, old_game: dict = None):
+        if old_game is not None:
+            Updater(self.matchdays.setdefault(old_game["matchday"], {})).remove_game(old_game)
+        if game is not None:
+            Updater(self.matchdays.setdefault(game["matchday"], {})).add_game(game)
+        first = min(g["matchday"] for g in (game, old_game) if g is not None)
+        for md in [md for md in self._as_of if md >= first]:
+            self._as_of.pop(md)
+
+
+class GameLine(NamedTuple):
+    """What a player did in one game.
+
+    Reports do not say which of the two teams is team1, so only the game and the player's stats are kept."""
+    matchday: int
+    title: str
+    stats: dict
+
+
+class PlayerGames:
+    """Games of each player, ordered by matchday, so !stats --games never reads the results.
+
+    Saved in the server snapshot, filled by update() during its pass over the results and changed game by game
+    by SERVER.apply."""
+
+    def __init__(self, games: dict[str, list[GameLine]] = None):
+        self.games: dict[str, list[GameLine]] = {} if games is None else games
+
+    def of(self, name: str) -> list[GameLine]:
+        with WRITE_BEHIND.lock:
+            return list(self.games.get(name, []))
+
+    def apply(self, game: dict = None, old_game: dict = None):
+        if old_game is not None:
+            for player in PlayerGames.lines(old_game):
+                lines = self.games.get(player, [])
+                lines[:] = [line for line in lines if (line.matchday, line.title) !=
+                            (old_game["matchday"], old_game["title"])]
+                if not lines:
+                    self.games.pop(player, None)
+        if game is not None:
+            for player, line in PlayerGames.lines(game).items():
+                bisect.insort(self.games.setdefault(player, []), line)
 
-        with open("resources/players/players.json", "w+") as db:
-            json.dump(self.players_db, db, indent=4)
+    @staticmethod
+    def lines(game: dict) -> dict[str, GameLine]:
+        if "team1" not in game:
+            return {}
+        lines = {}
+        for team in ("team1", "team2"):
+            for stat, players in game[team].items():
+                for player, n in players.items():
+                    if player not in lines:
+                        lines[player] = GameLine(game["matchday"], game["title"],
+                                                 {stat: 0 for stat in Matching.player_to_game})
+                    lines[player].stats[Matching.game_to_player[stat]] += n
+        return lines
 
 
 def update_stats(path_to_last_game):
@@ -69,10 +183,8 @@ def update_stats(path_to_last_game):
 
 class Players:
 
-    def __init__(self):
-        self.player_path = "resources/players/players.json"
-        with open(self.player_path, "r") as db:
-            self.players: dict = json.load(db)
+    def __init__(self, players: dict = None):
+        self.players: dict = STORAGE.load_players() if players is None else players
 
     def get_player(self, player):
         try:
@@ -84,16 +196,14 @@ class Players:
         if player_name in self.players:
             raise ValueError(f"Error : Player {player_name} already in the database")
         self.players[player_name] = stats
-        with open(self.player_path, "w+") as db:
-            json.dump(self.players, db, indent=4)
+        self.save()
 
     def delete_player(self, player_name):
         try:
             self.players.pop(player_name)
         except KeyError:
             raise ValueError(f"Error : Could not delete {player_name}, not in db")
-        with open(self.player_path, "w+") as db:
-            json.dump(self.players, db, indent=4)
+        self.save()
 
     def delete_players_alt(self, player_name):
         player = self.get_player(player_name)
@@ -104,15 +214,48 @@ class Players:
         else:
             raise ValueError(f"Error : No alt found for {player_name}")
 
-        with open(self.player_path, "w+") as db:
-            json.dump(self.players, db, indent=4)
+        self.save()
         return alts
 
+    def save(self):
+        WRITE_BEHIND.schedule("players", self._capture)
+
+    def _capture(self):
+        players = {name: dict(stats) for name, stats in self.players.items()}
+        return lambda: STORAGE.save_players(players)
+
     def __contains__(self, item):
         return item in self.players
 
 
+class LeaderboardView(Sequence):
+    """Read-only (player, stat, time) rows over a sorted index, slices only build the rows of the page.
+
+    The order is the one of the index when the view was made, later changes do not move the rows of a menu."""
+
+    def __init__(self, entries: list[tuple[float, str]], columns: PlayerColumns, key: str):
+        self.entries = list(entries)
+        self.columns = columns
+        self.key = key
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, item):
+        with WRITE_BEHIND.lock:
+            if isinstance(item, slice):
+                return [self._row(entry) for entry in self.entries[item]]
+            return self._row(self.entries[item])
+
+    def _row(self, entry):
+        return self.columns.row(entry[1], self.key)
+
+
 class Sorted:
+    """Leaderboards kept sorted per stat and per conference.
+
+    Each index is a list of (-value, name) of the players with a positive value, so that pages are plain
+    slices and a game only moves the players who played it."""
     valid_keys = {
         "time": "time",
         "goals": "goals",
@@ -123,59 +266,274 @@ class Sorted:
     }
 
     def __init__(self, players: Players):
-        self.time = []
-        self.goals = []
-        self.assists = []
-        self.own_goals = []
-        self.cs = []
-        self.saves = []
+        self.players = players.players
+        self.columns = PlayerColumns()
+        self.indexes: dict[tuple[str, str], list[tuple[float, str]]] = {}
+        self.ratio_indexes: dict[tuple[str, str], list[tuple[float, str]]] = {}
+        # (stat, conf, min_time) -> ratio index of the players having that much time
+        self._filtered: dict[tuple[str, str, int], list[tuple[float, str]]] = {}
         self.build(players)
 
-    def sort_players_by(self, key):
+    def sort_players_by(self, key, conf: str = None) -> LeaderboardView:
+        key = Sorted.stat(key)
+        with WRITE_BEHIND.lock:
+            return LeaderboardView(self.indexes.get((key, conf), []), self.columns, key)
+
+    def sort_players_by_ratio(self, key, conf: str = None, min_time: int = 0) -> LeaderboardView:
+        """Players by stat per time, only those who played at least min_time minutes.
+
+        The filtered index is kept until the next change, so paging and asking again cost nothing."""
+        key = Sorted.stat(key)
+        with WRITE_BEHIND.lock:
+            entries = self.ratio_indexes.get((key, conf), [])
+            if min_time > 0:
+                if (key, conf, min_time) not in self._filtered:
+                    times, ids, seconds = self.columns.columns["time"], self.columns.ids, min_time * 60
+                    self._filtered[(key, conf, min_time)] = [entry for entry in entries
+                                                             if times[ids[entry[1]]] >= seconds]
+                entries = self._filtered[(key, conf, min_time)]
+            return LeaderboardView(entries, self.columns, key)
+
+    def build(self, players: Players):
+        self.players = players.players
+        self.columns.build(self.players)
+        self.indexes.clear()
+        self.ratio_indexes.clear()
+        self._filtered.clear()
+        names, confs = self.columns.names, self.columns.confs
+        for key in Sorted.valid_keys.values():
+            values, ratios = self.columns.columns[key], self.columns.ratios(key)
+            for i, value in enumerate(values):
+                if value > 0:
+                    for conf in {None, confs[i]}:
+                        self.indexes.setdefault((key, conf), []).append((-value, names[i]))
+                        self.ratio_indexes.setdefault((key, conf), []).append((-ratios[i], names[i]))
+        for index in (*self.indexes.values(), *self.ratio_indexes.values()):
+            index.sort()
+
+    def restore(self, players: Players, orders: dict):
+        """Same as build, with the indexes already sorted in a snapshot: (kind, stat, conf) -> player ids,
+        the ids being the positions in players."""
+        self.players = players.players
+        self.columns.build(self.players)
+        self.indexes.clear()
+        self.ratio_indexes.clear()
+        self._filtered.clear()
+        names, ratios = self.columns.names, {key: self.columns.ratios(key) for key in Sorted.valid_keys.values()}
+        for (kind, key, conf), ids in orders.items():
+            if kind == "value":
+                values = self.columns.columns[key]
+                self.indexes[(key, conf)] = [(-values[i], names[i]) for i in ids]
+            else:
+                self.ratio_indexes[(key, conf)] = [(-ratios[key][i], names[i]) for i in ids]
+
+    def orders(self) -> dict:
+        """The indexes as (kind, stat, conf) -> names, for a snapshot."""
+        return {**{("value", key, conf): [name for _, name in index] for (key, conf), index in self.indexes.items()},
+                **{("ratio", key, conf): [name for _, name in index]
+                   for (key, conf), index in self.ratio_indexes.items()}}
+
+    def update(self, name: str, old_stats: dict = None):
+        """Move one player in the indexes, old_stats being their stats before the change."""
+        self.columns.set(name, self.players.get(name))
+        self._filtered.clear()
+        if old_stats is not None:
+            self._remove(name, old_stats)
+        if name in self.players:
+            self._insert(name, self.players[name])
+
+    @staticmethod
+    def stat(key) -> str:
         try:
-            key = Sorted.valid_keys[key]
+            return Sorted.valid_keys[key]
         except KeyError:
             raise ValueError(f"Error : You can not sort by this key `{key}`")
-        return getattr(self, key)
 
-    def build(self, players: Players):
+    @staticmethod
+    def _entries(stats: dict):
         for key in Sorted.valid_keys.values():
-            setattr(self, key,
-                    [(k, v[key], v["time"]) for k, v in
-                     sorted(players.players.items(), reverse=True, key=lambda item: item[1][key])])
+            if stats[key] > 0:
+                ratio = stat_per_time(stats[key], stats["time"])
+                for conf in {None, stats["conf"]}:
+                    yield (key, conf), -stats[key], -ratio
+
+    def _insert(self, name: str, stats: dict):
+        for index_key, value, ratio in Sorted._entries(stats):
+            bisect.insort(self.indexes.setdefault(index_key, []), (value, name))
+            bisect.insort(self.ratio_indexes.setdefault(index_key, []), (ratio, name))
+
+    def _remove(self, name: str, stats: dict):
+        for index_key, value, ratio in Sorted._entries(stats):
+            for index, entry in ((self.indexes[index_key], (value, name)),
+                                 (self.ratio_indexes[index_key], (ratio, name))):
+                i = bisect.bisect_left(index, entry)
+                if i < len(index) and index[i] == entry:
+                    del index[i]
 
 
 class Leaderboard:
-    player_path = "resources/players/players.json"
 
     @staticmethod
     def sort_by(key, conf: str = None):
-        with open(Leaderboard.player_path, "r") as db:
-            players: dict = json.load(db)
-        if conf is not None:
-            players = {k: v for k, v in players.items() if v["conf"] == conf}
-        return [(k, v[key], v["time"]) for k, v in sorted(players.items(), reverse=True, key=lambda item: item[1][key])
-                if v[key] > 0]
+        return SERVER.sorted.sort_players_by(key, conf)
+
+    @staticmethod
+    def sort_by_ratio(key, conf: str = None, min_time: int = 0):
+        return SERVER.sorted.sort_players_by_ratio(key, conf, min_time)
 
 
 class Server:
-    def __init__(self):
-        self.players: Players = Players()
-        self.sorted = Sorted(self.players)
-        self.table_west = Table("western")
-        self.table_east = Table("eastern")
+    """The aggregates in memory, loaded the first time they are used.
 
+    They are loaded from the snapshot written behind every change, or rebuilt from the results if there is none.
+    The snapshot may miss the last changes if the bot was killed, update() in the background fixes that,
+    building the new aggregates aside while the commands keep reading the loaded ones."""
+    snapshot_path = config.server_snapshot_path
+    loaded_on_use = {"players", "sorted", "names", "history", "games", "table_west", "table_east"}
+
+    def __init__(self):
+        # bumped whenever a game or a malus changes, rendered pages are cached per version
+        self.version = 0
+
+    def __getattr__(self, name):
+        if name not in Server.loaded_on_use:
+            raise AttributeError(name)
+        self.ensure_loaded()
+        return object.__getattribute__(self, name)
+
+    @property
+    def loaded(self) -> bool:
+        return "players" in self.__dict__
+
+    def ensure_loaded(self):
+        with WRITE_BEHIND.lock:
+            if not self.loaded:
+                self.load()
+
+    @METRICS.timed("server load")
+    def load(self):
+        with WRITE_BEHIND.lock:
+            try:
+                with Snapshot(Server.snapshot_path) as snapshot:
+                    version = snapshot.version
+                    players = Players(snapshot.players())
+                    orders, history, games = snapshot.orders(), snapshot.history(), snapshot.game_lines()
+                    tables = snapshot.tables()
+                sorted_players = Sorted(Players({}))
+                sorted_players.restore(players, orders)
+            except (FileNotFoundError, ValueError, KeyError, IndexError, struct.error):
+                # no snapshot yet, an older format or a damaged file: rebuild from the results
+                self.update()
+                return
+            self.version = version + 1
+            self.players: Players = players
+            self.sorted = sorted_players
+            self.names = NameIndex(self.players.players)
+            self.history = PlayerHistory(history)
+            self.games = PlayerGames(games)
+            self.table_west = Table("western")
+            self.table_east = Table("eastern")
+            self.table_west.load(tables.get("western", []))
+            self.table_east.load(tables.get("eastern", []))
+
+    @METRICS.timed("server update")
     def update(self):
-        Updater().update_all()
-        self.players: Players = Players()
-        self.sorted = Sorted(self.players)
-        self.table_west = Table("western")
-        self.table_east = Table("eastern")
-        self.table_west.update()
-        self.table_east.update()
+        """Rebuild everything in one pass over the results, then swap it in under the lock.
+
+        Runs on the writer thread, so no game is applied meanwhile."""
+        WRITE_BEHIND.flush()
+        TEAMS.reload()
+        index, history, player_games = GameIndex({}, {}), PlayerHistory(), PlayerGames()
+        tables = {"western": Table("western"), "eastern": Table("eastern")}
+
+        def count(game: dict):
+            if game.get("conf") in tables:
+                tables[game["conf"]].apply(game)
+
+        updater = Updater()
+        updater.update_all(index.apply, history.apply, player_games.apply, count)
+        players = Players(updater.players_db)
+        sorted_players, names = Sorted(players), NameIndex(players.players)
+        with WRITE_BEHIND.lock:
+            self.version += 1
+            GAMES.replace(index)
+            self.players: Players = players
+            self.sorted = sorted_players
+            self.names = names
+            self.history = history
+            self.games = player_games
+            self.table_west, self.table_east = tables["western"], tables["eastern"]
+            for table in tables.values():
+                table.save()
+            self.save()
+
+    def save(self):
+        """Write the snapshot behind, with the players and tables."""
+        WRITE_BEHIND.schedule("server snapshot", self._capture_snapshot)
+
+    def _capture_snapshot(self):
+        args = (Server.snapshot_path, self.version, {name: dict(stats) for name, stats in self.players.players.items()},
+                self.sorted.orders(), {table.conf: table.dump() for table in (self.table_west, self.table_east)},
+                {md: {name: dict(stats) for name, stats in players.items()}
+                 for md, players in self.history.matchdays.items()},
+                {name: list(lines) for name, lines in self.games.games.items()})
+        return lambda: write_snapshot(*args)
+
+    @METRICS.timed("server update")
+    def apply(self, game: dict = None, old_game: dict = None):
+        """Apply the delta of one game to the aggregates.
+
+        old_game is the previously saved version of the game (None for a new report),
+        game is the new version (None when the game is deleted)."""
+        with WRITE_BEHIND.lock:
+            self.version += 1
+            touched = {name: copy.copy(self.players.players.get(name))
+                       for g in (old_game, game) if g is not None for name in Updater.players_of(g)}
+            updater = Updater(self.players.players)
+            if old_game is not None:
+                updater.remove_game(old_game)
+            if game is not None:
+                updater.add_game(game)
+            self.players.save()
+            self.history.apply(game, old_game)
+            self.games.apply(game, old_game)
+            for name, old_stats in touched.items():
+                self.sorted.update(name, old_stats)
+                if name in self.players.players:
+                    self.names.add(name)
+                else:
+                    self.names.remove(name)
+
+            tables = set()
+            if old_game is not None:
+                table = self.table(old_game["conf"])
+                table.remove(old_game)
+                tables.add(table)
+            if game is not None:
+                table = self.table(game["conf"])
+                table.apply(game)
+                tables.add(table)
+            for table in tables:
+                table.save()
+            self.save()
+
+    @METRICS.timed("server update")
+    def update_malus(self):
+        with WRITE_BEHIND.lock:
+            self.version += 1
+            for table in (self.table_west, self.table_east):
+                table.update_malus()
+                table.save()
+            self.save()
 
     def table(self, conf) -> Table:
         return self.table_west if conf.lower() in {"w", "west", "western"} else self.table_east
 
+    def versioned(self, read: Callable, *args):
+        """(version, read(*args)), both taken under the lock so that a page is never cached under a version
+        newer than its data."""
+        with WRITE_BEHIND.lock:
+            return self.version, read(*args)
+
 
 SERVER = Server()
@@ -0,0 +1,47 @@
+import json
+import os
+
+from src.modules.files import atomic_write_json
+
+
+class Prefixes:
+    """Guild prefixes, served from memory.
+
+    The file is only parsed again when its mtime changed, writes go through an atomic rename."""
+    default = "!"
+
+    def __init__(self, path="prefixes.json"):
+        self.path = path
+        self._prefixes: dict[str, str] = {}
+        self._mtime = None
+
+    def get(self, guild_id) -> str:
+        self._refresh()
+        return self._prefixes.get(str(guild_id), Prefixes.default)
+
+    def set(self, guild_id, prefix: str):
+        self._refresh()
+        self._prefixes[str(guild_id)] = prefix
+        self._save()
+
+    def remove(self, guild_id):
+        self._refresh()
+        if self._prefixes.pop(str(guild_id), None) is not None:
+            self._save()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r") as f:
+                self._prefixes = json.load(f)
+            self._mtime = mtime
+
+    def _save(self):
+        atomic_write_json(self.path, self._prefixes, indent=4)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+
+PREFIXES = Prefixes()
@@ -0,0 +1,33 @@
+import os
+
+from src.modules.files import atomic_write_bytes
+
+
+class RawReports:
+    """Raw half reports cached by (channel_id, message_id), in memory and under resources/raw/."""
+    path = "resources/raw"
+
+    def __init__(self):
+        self._cache: dict[tuple[int, int], str] = {}
+
+    @staticmethod
+    def filename(channel_id: int, message_id: int) -> str:
+        return os.path.join(RawReports.path, f"{channel_id}-{message_id}.txt")
+
+    def get(self, channel_id: int, message_id: int):
+        """Return the cached report, or None if it was never fetched."""
+        key = (channel_id, message_id)
+        if key not in self._cache:
+            try:
+                with open(RawReports.filename(*key), "r", encoding="utf-8") as raw:
+                    self._cache[key] = raw.read()
+            except FileNotFoundError:
+                return None
+        return self._cache[key]
+
+    def put(self, channel_id: int, message_id: int, game: str):
+        self._cache[(channel_id, message_id)] = game
+        atomic_write_bytes(RawReports.filename(channel_id, message_id), game.encode("utf-8"))
+
+
+RAW_REPORTS = RawReports()
@@ -0,0 +1,216 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from src.modules.files import atomic_write_bytes
+
+MAGIC = b"LGSN"
+FORMAT = 3
+HEADER = struct.Struct("<4sHHQ")  # magic, format, number of sections, server version
+SECTION = struct.Struct("<8sQQ")  # name, offset, length
+RESULT = struct.Struct("<IHHii20sB")  # matchday, team1, team2, score1, score2, sha1 of the score, conf
+HISTORY = struct.Struct("<IIB6q")  # matchday, player, conf, the stats of the player in that matchday
+GAME_LINE = struct.Struct("<III6q")  # player, matchday, title, the stats of the player in that game
+STATS = {"time": b"time", "goals": b"goals", "assists": b"assists", "saves": b"saves", "cs": b"cs",
+         "own goals": b"og"}
+NO_CONF = 255
+
+
+def pack_strings(strings: list[str]) -> bytes:
+    """count, byte offsets of each string, then the utf-8 strings joined by NUL."""
+    encoded = [string.encode() for string in strings]
+    offsets, position = array("I"), 0
+    for string in encoded:
+        offsets.append(position)
+        position += len(string) + 1
+    offsets.append(position)
+    return struct.pack("<I", len(encoded)) + _bytes(offsets) + b"\0".join(encoded) + b"\0" * bool(encoded)
+
+
+def write_snapshot(path: str, version: int, players: dict, orders: dict[tuple, list[str]], tables: dict[str, list],
+                   history: dict[int, dict], game_lines: dict[str, list]):
+    """Write the aggregates as a snapshot file.
+
+    players: name -> stats, orders: (kind, stat, conf) -> names in the order of a leaderboard index,
+    tables: conf -> results counted, as in Table.dump, history: matchday -> name -> stats of that matchday,
+    game_lines: name -> (matchday, title, stats) of each game played."""
+    names = sorted(players)
+    ids = {name: i for i, name in enumerate(names)}
+    history_names = sorted({name for matchday in history.values() for name in matchday} | set(game_lines))
+    history_ids = {name: i for i, name in enumerate(history_names)}
+    titles = sorted({title for lines in game_lines.values() for _, title, _ in lines})
+    title_ids = {title: i for i, title in enumerate(titles)}
+    confs = sorted({stats["conf"] for stats in players.values() if stats["conf"] is not None} | set(tables)
+                   | {stats["conf"] for matchday in history.values() for stats in matchday.values()
+                      if stats["conf"] is not None})
+    conf_ids = {conf: i for i, conf in enumerate(confs)}
+    teams = sorted({team for results in tables.values() for _, match_teams, _, _ in results for team in match_teams})
+    team_ids = {team: i for i, team in enumerate(teams)}
+
+    sections = {
+        b"players": pack_strings(names),
+        b"confs": pack_strings(confs),
+        b"pconf": _bytes(array("B", [conf_ids.get(players[name]["conf"], NO_CONF) for name in names])),
+        **{section: _bytes(array("q", [players[name][stat] for name in names])) for stat, section in STATS.items()},
+        b"idxkeys": pack_strings(["|".join((kind, stat, conf or "")) for kind, stat, conf in orders]),
+        b"idxoffs": _bytes(array("Q", _offsets(len(order) for order in orders.values()))),
+        b"idxids": _bytes(array("I", [ids[name] for order in orders.values() for name in order])),
+        b"teams": pack_strings(teams),
+        b"results": b"".join(
+            RESULT.pack(matchday, team_ids[team1], team_ids[team2], score[team1], score[team2],
+                        bytes.fromhex(digest), conf_ids[conf])
+            for conf, results in tables.items() for matchday, (team1, team2), digest, score in results),
+        b"hnames": pack_strings(history_names),
+        b"history": b"".join(
+            HISTORY.pack(matchday, history_ids[name], conf_ids.get(stats["conf"], NO_CONF),
+                         *(stats[stat] for stat in STATS))
+            for matchday, matchday_players in history.items() for name, stats in matchday_players.items()),
+        b"titles": pack_strings(titles),
+        b"glines": b"".join(
+            GAME_LINE.pack(history_ids[name], matchday, title_ids[title], *(stats[stat] for stat in STATS))
+            for name, lines in game_lines.items() for matchday, title, stats in lines),
+    }
+    offset = HEADER.size + SECTION.size * len(sections)
+    toc = b""
+    for name, content in sections.items():
+        toc += SECTION.pack(name, offset, len(content))
+        offset += len(content)
+    atomic_write_bytes(path, HEADER.pack(MAGIC, FORMAT, len(sections), version) + toc + b"".join(sections.values()))
+
+
+class Snapshot:
+    """Memory-mapped snapshot, sections are only decoded when asked for.
+
+    Players are stored sorted by name with one int64 column per stat, so player() finds one without reading
+    the others, and the columns load as a single copy each."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._sections: dict[bytes, tuple[int, int]] = {}
+        try:
+            magic, file_format, n_sections, self.version = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or file_format != FORMAT:
+                raise ValueError(f"Error : {path} is not a snapshot of format {FORMAT}")
+            for i in range(n_sections):
+                name, offset, length = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+                if offset + length > len(self._map):
+                    raise ValueError(f"Error : {path} is truncated")
+                self._sections[name.rstrip(b"\0")] = offset, length
+        except (ValueError, struct.error) as e:
+            self.close()
+            raise ValueError(f"Error : {path} is not a snapshot of format {FORMAT}") from e
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def strings(self, section: bytes) -> list[str]:
+        offset, length = self._sections[section]
+        count = struct.unpack_from("<I", self._map, offset)[0]
+        start = offset + 4 + 4 * (count + 1)
+        return self._map[start:offset + length - 1].decode().split("\0") if count else []
+
+    def array(self, section: bytes, typecode: str) -> array:
+        offset, length = self._sections[section]
+        values = array(typecode)
+        values.frombytes(self._map[offset:offset + length])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def player(self, name: str):
+        """Stats of one player, or None, found by binary search over the sorted names."""
+        offset, _ = self._sections[b"players"]
+        count = struct.unpack_from("<I", self._map, offset)[0]
+        low, high, encoded = 0, count, name.encode()
+        while low < high:
+            middle = (low + high) // 2
+            if self._string(offset, count, middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low == count or self._string(offset, count, low) != encoded:
+            return None
+        stats = {stat: struct.unpack_from("<q", self._map, self._sections[section][0] + 8 * low)[0]
+                 for stat, section in STATS.items()}
+        conf = self._map[self._sections[b"pconf"][0] + low]
+        stats["conf"] = None if conf == NO_CONF else self.strings(b"confs")[conf]
+        return stats
+
+    def players(self) -> dict:
+        names, confs = self.strings(b"players"), self.strings(b"confs")
+        conf_ids = self.array(b"pconf", "B")
+        columns = [self.array(section, "q") for section in STATS.values()]
+        return {name: {**dict(zip(STATS, row)), "conf": None if conf == NO_CONF else confs[conf]}
+                for name, conf, *row in zip(names, conf_ids, *columns)}
+
+    def orders(self) -> dict[tuple, array]:
+        """(kind, stat, conf) -> ids of the players, in the order of the leaderboard index."""
+        keys, offsets, ids = self.strings(b"idxkeys"), self.array(b"idxoffs", "Q"), self.array(b"idxids", "I")
+        orders = {}
+        for i, key in enumerate(keys):
+            kind, stat, conf = key.split("|")
+            orders[(kind, stat, conf or None)] = ids[offsets[i]:offsets[i + 1]]
+        return orders
+
+    def tables(self) -> dict[str, list]:
+        confs, teams = self.strings(b"confs"), self.strings(b"teams")
+        offset, length = self._sections[b"results"]
+        tables = {conf: [] for conf in confs}
+        for matchday, team1, team2, score1, score2, digest, conf in \
+                RESULT.iter_unpack(self._map[offset:offset + length]):
+            team1, team2 = teams[team1], teams[team2]
+            tables[confs[conf]].append([matchday, [team1, team2], digest.hex(), {team1: score1, team2: score2}])
+        return tables
+
+    def history(self) -> dict[int, dict]:
+        names, confs = self.strings(b"hnames"), self.strings(b"confs")
+        offset, length = self._sections[b"history"]
+        history = {}
+        for matchday, name, conf, *row in HISTORY.iter_unpack(self._map[offset:offset + length]):
+            history.setdefault(matchday, {})[names[name]] = {**dict(zip(STATS, row)),
+                                                             "conf": None if conf == NO_CONF else confs[conf]}
+        return history
+
+    def game_lines(self) -> dict[str, list]:
+        """name -> GameLine of each game played, in the order they were written."""
+        from src.modules.players import GameLine
+        names, titles = self.strings(b"hnames"), self.strings(b"titles")
+        offset, length = self._sections[b"glines"]
+        lines = {}
+        for name, matchday, title, *row in GAME_LINE.iter_unpack(self._map[offset:offset + length]):
+            lines.setdefault(names[name], []).append(GameLine(matchday, titles[title], dict(zip(STATS, row))))
+        return lines
+
+    def to_json(self) -> dict:
+        """Everything in the snapshot, for humans."""
+        return {"version": self.version, "players": self.players(), "tables": self.tables(),
+                "history": self.history(),
+                "games": {name: [line._asdict() for line in lines] for name, lines in self.game_lines().items()}}
+
+    def _string(self, offset: int, count: int, i: int) -> bytes:
+        start, end = struct.unpack_from("<II", self._map, offset + 4 + 4 * i)
+        blob = offset + 4 + 4 * (count + 1)
+        return self._map[blob + start:blob + end - 1]
+
+
+def _bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _offsets(lengths):
+    offsets, position = [0], 0
+    for length in lengths:
+        position += length
+        offsets.append(position)
+    return offsets
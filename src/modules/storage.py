@@ -0,0 +1,374 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterator
+
+import config
+from src.modules.files import atomic_write_json
+from src.modules.json_encoder import EnhancedJSONEncoder
+from src.modules.metrics import METRICS
+
+
+class Storage:
+    """Where results, players, tables, malus and teams are stored.
+
+    Every read and write of the league state goes through one of these backends."""
+
+    def load_game(self, matchday: int, title: str) -> dict:
+        raise NotImplementedError
+
+    def save_game(self, game: dict):
+        raise NotImplementedError
+
+    def save_games(self, games: list[dict]):
+        for game in games:
+            self.save_game(game)
+
+    def delete_game(self, matchday: int, title: str):
+        raise NotImplementedError
+
+    def games(self, conf: str = None) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def matchday_games(self, matchday: int) -> list[dict]:
+        raise NotImplementedError
+
+    def load_players(self) -> dict:
+        raise NotImplementedError
+
+    def save_players(self, players: dict):
+        raise NotImplementedError
+
+    def load_table(self, conf: str) -> dict:
+        raise NotImplementedError
+
+    def save_table(self, conf: str, table: dict):
+        raise NotImplementedError
+
+    def load_malus(self) -> dict:
+        raise NotImplementedError
+
+    def save_malus(self, malus: dict):
+        raise NotImplementedError
+
+    def load_teams(self) -> dict:
+        raise NotImplementedError
+
+    def save_teams(self, teams: dict):
+        raise NotImplementedError
+
+    def load_game_index(self):
+        """(matchday -> team -> title, matchday -> title -> summary) of the results, None when there is none."""
+        raise NotImplementedError
+
+    def save_game_index(self, index: dict, matchdays: dict):
+        raise NotImplementedError
+
+
+class JsonStorage(Storage):
+    """The historical layout: one json file per result and per aggregate under resources/."""
+    results_path = "resources/results"
+    players_path = "resources/players/players.json"
+    tables_path = "resources/tables"
+    malus_path = "resources/malus/malus.json"
+    teams_path = "resources/teams/teams.json"
+    index_path = "resources/results/index.json"
+    matchdays_path = "resources/results/matchdays.json"
+    # the games with warnings, now part of the matchday summaries
+    legacy_warnings_path = "resources/results/warnings.json"
+
+    @staticmethod
+    def game_path(matchday: int, title: str) -> str:
+        return os.path.join(JsonStorage.results_path, str(matchday), f"{title}.json")
+
+    def load_game(self, matchday, title):
+        try:
+            with open(self.game_path(matchday, title), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Error : Could not find the match {title} of matchday {matchday}")
+
+    def save_game(self, game):
+        atomic_write_json(self.game_path(game["matchday"], game["title"]), game, indent=4, cls=EnhancedJSONEncoder)
+
+    def delete_game(self, matchday, title):
+        try:
+            os.remove(self.game_path(matchday, title))
+        except FileNotFoundError:
+            pass
+
+    def games(self, conf=None):
+        for filename in glob.glob(f"{JsonStorage.results_path}/*/*.json"):
+            with open(filename, "r") as f:
+                game = json.load(f)
+            if conf is None or game.get("conf") == conf:
+                yield game
+
+    def matchday_games(self, matchday):
+        res = []
+        for filename in glob.glob(f"{JsonStorage.results_path}/{matchday}/*.json"):
+            with open(filename, "r") as f:
+                res.append(json.load(f))
+        return res
+
+    def load_players(self):
+        with open(JsonStorage.players_path, "r") as db:
+            return json.load(db)
+
+    def save_players(self, players):
+        atomic_write_json(JsonStorage.players_path, players, separators=(",", ":"))
+
+    def load_table(self, conf):
+        with open(os.path.join(JsonStorage.tables_path, f"{conf}.json"), "r") as f:
+            return json.load(f)
+
+    def save_table(self, conf, table):
+        atomic_write_json(os.path.join(JsonStorage.tables_path, f"{conf}.json"), table, separators=(",", ":"))
+
+    def load_malus(self):
+        with open(JsonStorage.malus_path, "r") as f:
+            return json.load(f)
+
+    def save_malus(self, malus):
+        atomic_write_json(JsonStorage.malus_path, malus, indent=4)
+
+    def load_teams(self):
+        with open(JsonStorage.teams_path, "r") as f:
+            return json.load(f)
+
+    def save_teams(self, teams):
+        atomic_write_json(JsonStorage.teams_path, teams, indent=4)
+
+    def load_game_index(self):
+        try:
+            with open(JsonStorage.index_path, "r") as f:
+                index = json.load(f)
+            with open(JsonStorage.matchdays_path, "r") as f:
+                return index, json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_game_index(self, index, matchdays):
+        atomic_write_json(JsonStorage.index_path, index)
+        atomic_write_json(JsonStorage.matchdays_path, matchdays)
+        if os.path.exists(JsonStorage.legacy_warnings_path):
+            os.remove(JsonStorage.legacy_warnings_path)
+
+
+class SqliteStorage(Storage):
+    """Everything in one SQLite database in WAL mode.
+
+    The game index lives in result_teams and result_summaries, written in the same transaction as the result.
+    Each thread has its own connection, so the readers never see the writer's open transaction."""
+    schema = """
+        CREATE TABLE IF NOT EXISTS results (
+            matchday INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            conf TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (matchday, title)
+        );
+        CREATE INDEX IF NOT EXISTS results_conf ON results (conf, matchday);
+        CREATE TABLE IF NOT EXISTS result_teams (
+            matchday INTEGER NOT NULL,
+            team TEXT NOT NULL,
+            title TEXT NOT NULL,
+            PRIMARY KEY (matchday, team)
+        );
+        CREATE INDEX IF NOT EXISTS result_teams_team ON result_teams (team);
+        CREATE TABLE IF NOT EXISTS result_summaries (
+            matchday INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (matchday, title)
+        );
+        CREATE TABLE IF NOT EXISTS player_stats (
+            player TEXT NOT NULL,
+            stat TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            conf TEXT,
+            PRIMARY KEY (player, stat)
+        );
+        CREATE TABLE IF NOT EXISTS standings (
+            conf TEXT NOT NULL,
+            team TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (conf, team)
+        );
+        CREATE TABLE IF NOT EXISTS malus (
+            conf TEXT NOT NULL,
+            team TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (conf, team)
+        );
+        CREATE TABLE IF NOT EXISTS teams (
+            conf TEXT NOT NULL,
+            team TEXT NOT NULL,
+            PRIMARY KEY (conf, team)
+        );
+    """
+
+    def __init__(self, path: str = "resources/league.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connection.executescript(SqliteStorage.schema)
+        self._index_results()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def load_game(self, matchday, title):
+        row = self._connection.execute("SELECT data FROM results WHERE matchday = ? AND title = ?",
+                                      (matchday, title)).fetchone()
+        if row is None:
+            raise ValueError(f"Error : Could not find the match {title} of matchday {matchday}")
+        return json.loads(row[0])
+
+    def save_game(self, game):
+        with self._connection:
+            self._insert_game(game)
+
+    def save_games(self, games: list[dict]):
+        """Write many results in a single transaction."""
+        with self._connection:
+            for game in games:
+                self._insert_game(game)
+
+    def delete_game(self, matchday, title):
+        with self._connection:
+            self._connection.execute("DELETE FROM results WHERE matchday = ? AND title = ?", (matchday, title))
+            self._connection.execute("DELETE FROM result_teams WHERE matchday = ? AND title = ?", (matchday, title))
+            self._connection.execute("DELETE FROM result_summaries WHERE matchday = ? AND title = ?",
+                                    (matchday, title))
+
+    def games(self, conf=None):
+        if conf is None:
+            rows = self._connection.execute("SELECT data FROM results ORDER BY matchday")
+        else:
+            rows = self._connection.execute("SELECT data FROM results WHERE conf = ? ORDER BY matchday", (conf,))
+        for row in rows.fetchall():
+            yield json.loads(row[0])
+
+    def matchday_games(self, matchday):
+        rows = self._connection.execute("SELECT data FROM results WHERE matchday = ?", (matchday,))
+        return [json.loads(row[0]) for row in rows.fetchall()]
+
+    def load_players(self):
+        players = {}
+        for player, stat, value, conf in self._connection.execute("SELECT player, stat, value, conf FROM player_stats"):
+            players.setdefault(player, {"conf": conf})[stat] = value
+        return players
+
+    def save_players(self, players):
+        rows = [(player, stat, value, stats.get("conf"))
+                for player, stats in players.items()
+                for stat, value in stats.items() if stat != "conf"]
+        with self._connection:
+            self._connection.execute("DELETE FROM player_stats")
+            self._connection.executemany("INSERT INTO player_stats VALUES (?, ?, ?, ?)", rows)
+
+    def load_table(self, conf):
+        rows = self._connection.execute("SELECT team, data FROM standings WHERE conf = ?", (conf,))
+        return {team: json.loads(data) for team, data in rows.fetchall()}
+
+    def save_table(self, conf, table):
+        with self._connection:
+            self._connection.execute("DELETE FROM standings WHERE conf = ?", (conf,))
+            self._connection.executemany("INSERT INTO standings VALUES (?, ?, ?)",
+                                        [(conf, team, json.dumps(data)) for team, data in table.items()])
+
+    def load_malus(self):
+        malus = {}
+        for conf, team, value in self._connection.execute("SELECT conf, team, value FROM malus ORDER BY rowid"):
+            malus.setdefault(conf, {})[team] = value
+        return malus
+
+    def save_malus(self, malus):
+        with self._connection:
+            self._connection.execute("DELETE FROM malus")
+            self._connection.executemany("INSERT INTO malus VALUES (?, ?, ?)",
+                                        [(conf, team, value)
+                                         for conf, teams in malus.items() for team, value in teams.items()])
+
+    def load_teams(self):
+        teams = {}
+        for conf, team in self._connection.execute("SELECT conf, team FROM teams ORDER BY rowid"):
+            teams.setdefault(conf, []).append(team)
+        return teams
+
+    def save_teams(self, teams):
+        with self._connection:
+            self._connection.execute("DELETE FROM teams")
+            self._connection.executemany("INSERT INTO teams VALUES (?, ?)",
+                                        [(conf, team) for conf, conf_teams in teams.items() for team in conf_teams])
+
+    def load_game_index(self):
+        index, matchdays = {}, {}
+        for matchday, team, title in self._connection.execute("SELECT matchday, team, title FROM result_teams"):
+            index.setdefault(str(matchday), {})[team] = title
+        for matchday, title, data in self._connection.execute("SELECT matchday, title, data FROM result_summaries"):
+            matchdays.setdefault(str(matchday), {})[title] = json.loads(data)
+        return index, matchdays
+
+    def save_game_index(self, index, matchdays):
+        """Nothing to do, the index is written with each result by _insert_game and delete_game."""
+
+    def _insert_game(self, game: dict):
+        self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                (game["matchday"], game["title"], game.get("conf"),
+                                 json.dumps(game, cls=EnhancedJSONEncoder)))
+        if isinstance(game.get("score"), dict):
+            self._connection.executemany("INSERT OR REPLACE INTO result_teams VALUES (?, ?, ?)",
+                                        [(game["matchday"], team, game["title"]) for team in game["score"]])
+            self._connection.execute("INSERT OR REPLACE INTO result_summaries VALUES (?, ?, ?)",
+                                    (game["matchday"], game["title"], json.dumps(game_summary(game))))
+
+    def _index_results(self):
+        """Fill result_summaries for the results stored before it existed."""
+        missing = self._connection.execute(
+            "SELECT data FROM results r WHERE NOT EXISTS "
+            "(SELECT 1 FROM result_summaries s WHERE s.matchday = r.matchday AND s.title = r.title)").fetchall()
+        with self._connection:
+            for row in missing:
+                self._insert_game(json.loads(row[0]))
+
+
+def game_summary(game: dict) -> dict:
+    """What the game index keeps of a result: enough for !matchday, !matchdays and !warnings."""
+    return {"matchday": game["matchday"], "score": game["score"], "conf": game.get("conf"),
+            "warnings": list(game.get("warnings", []))}
+
+
+def create_storage(backend: str) -> Storage:
+    if backend == "json":
+        return JsonStorage()
+    if backend == "sqlite":
+        return SqliteStorage(config.sqlite_path)
+    raise ValueError(f"Error : Unknown storage backend {backend}, must be json or sqlite")
+
+
+def migrate(source: Storage, target: Storage):
+    """Copy the whole league state from source to target."""
+    games = list(source.games())
+    target.save_games(games)
+    target.save_teams(source.load_teams())
+    target.save_malus(source.load_malus())
+    target.save_players(source.load_players())
+    for conf in source.load_teams():
+        try:
+            target.save_table(conf, source.load_table(conf))
+        except FileNotFoundError:
+            continue  # never computed, the next SERVER.update() builds it
+    return len(games)
+
+
+STORAGE: Storage = METRICS.instrument(create_storage(config.storage), "io")
@@ -1,6 +1,11 @@
-import glob
+import copy
+import hashlib
 import json
 
+from src.modules.persistence import WRITE_BEHIND
+from src.modules.storage import STORAGE
+from src.modules.teams import TEAMS
+
 
 class Team:
     def __init__(self, name: str = "", games_played: int = 0, wins: int = 0, draws: int = 0,
@@ -22,16 +27,30 @@ class Team:
     def goals_diff(self):
         return self.goals_for - self.goals_against
 
-    def update(self, score_self, score_opponent):
-        self.games_played += 1
-        self.goals_for += score_self
-        self.goals_against += score_opponent
+    def update(self, score_self, score_opponent, sign: int = 1):
+        """Count a game, or take it back with sign=-1."""
+        self.games_played += sign
+        self.goals_for += sign * score_self
+        self.goals_against += sign * score_opponent
         if score_self > score_opponent:
-            self.wins += 1
+            self.wins += sign
         elif score_self == score_opponent:
-            self.draws += 1
+            self.draws += sign
         else:
-            self.losses += 1
+            self.losses += sign
+
+    def add(self, other: "Team"):
+        """Add the games counted in other, its malus is ignored."""
+        self.games_played += other.games_played
+        self.wins += other.wins
+        self.draws += other.draws
+        self.losses += other.losses
+        self.goals_for += other.goals_for
+        self.goals_against += other.goals_against
+
+    @staticmethod
+    def rank_key(team: "Team"):
+        return team.points, team.goals_diff, team.goals_for, team.goals_against, team.wins, team.name
 
     def to_json(self):
         res = self.__dict__
@@ -42,32 +61,118 @@ class Team:
 
 class Table:
     def __init__(self, conf):
-        with open("resources/teams/teams.json") as f:
-            teams = json.load(f)[f"{conf}"]
-            self.teams: dict[str, Team] = {team: Team(name=team) for team in teams}
-        with open("resources/malus/malus.json") as malus_fp:
-            teams = json.load(malus_fp)[f"{conf}"]
-            for team, malus in teams.items():
-                self.teams[team].malus = malus
+        teams = TEAMS.by_conf().get(conf, [])
+        self.teams: dict[str, Team] = {team: Team(name=team) for team in teams}
         self.conf = conf
-        self.results_done = set()
+        # (matchday, teams) -> (hash of the score, score) of every game counted in the table
+        self.results_done: dict[tuple, tuple[str, dict]] = {}
+        # matchday -> team -> games of that matchday only, and the standings after a matchday once asked for
+        self.matchdays: dict[int, dict[str, Team]] = {}
+        self._as_of: dict[int, dict[str, Team]] = {}
+        self.update_malus()
 
     def update(self):
-        path = f"resources/tables/{self.conf}.json"
-        json.dump({}, open(path, "w+"))
-        for filename in glob.glob("resources/results/*/*.json"):
-            if filename in self.results_done:
-                continue
-            with open(filename, "r") as f:
-                game: dict = json.load(f)
-                if game["conf"] != self.conf:
-                    continue
-                self.results_done.add(filename)
-                score = game["score"]
-                team1, team2 = score.keys()
-                self.teams[team1].update(score[team1], score[team2])
-                self.teams[team2].update(score[team2], score[team1])
-
-        res = {team_name: team.to_json() for team_name, team in self.teams.items()}
-        with open(path, "w+") as db:
-            json.dump(res, db, indent=4)
+        """Synchronise with the stored results, only new, edited or deleted games change the table."""
+        seen = set()
+        for game in STORAGE.games(self.conf):
+            seen.add(Table.key(game))
+            self.apply(game)
+        for key in set(self.results_done) - seen:
+            self._count(key[0], *self.results_done.pop(key)[1].items(), sign=-1)
+        self.save()
+
+    def apply(self, game: dict):
+        """Count game in the table, replacing the version of it that was counted before, if any."""
+        key, digest = Table.key(game), Table.digest(game)
+        done = self.results_done.get(key)
+        if done is not None and done[0] == digest:
+            return
+        if done is not None:
+            self._count(key[0], *done[1].items(), sign=-1)
+        self.results_done[key] = digest, dict(game["score"])
+        self._count(key[0], *game["score"].items())
+
+    def remove(self, game: dict):
+        key = Table.key(game)
+        done = self.results_done.pop(key, None)
+        if done is not None:
+            self._count(key[0], *done[1].items(), sign=-1)
+
+    def load(self, results: list):
+        """Count the results of a snapshot, see dump."""
+        for matchday, teams, digest, score in results:
+            self.results_done[(matchday, tuple(teams))] = digest, score
+            self._count(matchday, *score.items())
+
+    def dump(self) -> list:
+        return [[matchday, list(teams), digest, score]
+                for (matchday, teams), (digest, score) in self.results_done.items()]
+
+    def update_malus(self):
+        for team, malus in STORAGE.load_malus()[f"{self.conf}"].items():
+            self.teams[team].malus = malus
+        self._as_of.clear()
+
+    def as_of(self, matchday: int) -> dict[str, Team]:
+        """The teams after matchday, summed from the closest matchday already asked for.
+
+        Malus are not dated, the current ones are applied."""
+        with WRITE_BEHIND.lock:
+            return self._sum_as_of(matchday)
+
+    def _sum_as_of(self, matchday: int) -> dict[str, Team]:
+        if matchday not in self._as_of:
+            start = max((md for md in self._as_of if md < matchday), default=None)
+            if start is None:
+                teams = {name: Team(name=name, malus=team.malus) for name, team in self.teams.items()}
+            else:
+                teams = {name: copy.copy(team) for name, team in self._as_of[start].items()}
+            for md in sorted(md for md in self.matchdays if (start is None or md > start) and md <= matchday):
+                for name, delta in self.matchdays[md].items():
+                    teams[name].add(delta)
+            self._as_of[matchday] = teams
+        return self._as_of[matchday]
+
+    def last_matchday(self) -> int:
+        with WRITE_BEHIND.lock:
+            return max((md for md, teams in self.matchdays.items() if any(t.games_played for t in teams.values())),
+                       default=0)
+
+    def standings(self, matchday: int = None) -> list[Team]:
+        """Copies of the teams sorted by rank, now or after matchday, later changes do not touch them."""
+        with WRITE_BEHIND.lock:
+            teams = self.teams if matchday is None else self._sum_as_of(matchday)
+            return sorted(map(copy.copy, teams.values()), key=Team.rank_key, reverse=True)
+
+    def moves(self, matchday: int = None) -> dict[str, int]:
+        """Places won (or lost, negative) by each team during matchday, the last one played by default."""
+        with WRITE_BEHIND.lock:
+            matchday = self.last_matchday() if matchday is None else matchday
+            if matchday <= 1:
+                return {}
+            before = {team.name: i for i, team in enumerate(self.standings(matchday - 1))}
+            return {team.name: before[team.name] - i for i, team in enumerate(self.standings(matchday))}
+
+    def save(self):
+        WRITE_BEHIND.schedule(f"table {self.conf}", self._capture)
+
+    def _capture(self):
+        res = {team_name: dict(team.to_json()) for team_name, team in self.teams.items()}
+        return lambda: STORAGE.save_table(self.conf, res)
+
+    @staticmethod
+    def key(game: dict) -> tuple:
+        return game["matchday"], tuple(sorted(game["score"]))
+
+    @staticmethod
+    def digest(game: dict) -> str:
+        return hashlib.sha1(json.dumps(game["score"], sort_keys=True).encode()).hexdigest()
+
+    def _count(self, matchday, result1, result2, sign=1):
+        (team1, score1), (team2, score2) = result1, result2
+        deltas = self.matchdays.setdefault(matchday, {})
+        for team, score_self, score_opponent in ((team1, score1, score2), (team2, score2, score1)):
+            self.teams[team].update(score_self, score_opponent, sign)
+            deltas.setdefault(team, Team(name=team)).update(score_self, score_opponent, sign)
+        for md in [md for md in self._as_of if md >= matchday]:
+            self._as_of.pop(md)
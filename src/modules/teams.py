@@ -0,0 +1,121 @@
+from typing import NamedTuple
+
+from src.modules.storage import STORAGE
+
+
+class TeamMatch(NamedTuple):
+    start: int
+    end: int
+    team: str
+
+
+class TeamMatcher:
+    """Aho-Corasick automaton over the team names.
+
+    find_all scans a text once and returns the leftmost-longest, non-overlapping team names
+    found between word boundaries, so "hc sad" never matches inside "hc sadness"."""
+
+    def __init__(self, teams: dict[str, list[str]]):
+        self.confs: dict[str, str] = {team: conf for conf, conf_teams in teams.items() for team in conf_teams}
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[str]] = [[]]
+        for team in self.confs:
+            self._insert(team)
+        self._link()
+
+    def find_all(self, text: str) -> list[TeamMatch]:
+        found = []
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for team in self._out[state]:
+                start = i + 1 - len(team)
+                if self._bounded(text, start, i + 1):
+                    found.append(TeamMatch(start, i + 1, team))
+        found.sort(key=lambda match: (match.start, match.start - match.end))
+        matches, end = [], 0
+        for match in found:
+            if match.start >= end:
+                matches.append(match)
+                end = match.end
+        return matches
+
+    def resolve(self, name: str) -> str:
+        """Return the team matching name: the exact name, the only team found in it, or the only team containing it."""
+        name = name.lower().strip()
+        if name in self.confs:
+            return name
+        candidates = list(dict.fromkeys(match.team for match in self.find_all(name)))
+        if not candidates:
+            candidates = [team for team in self.confs if name in team]
+        if len(candidates) > 1:
+            raise ValueError(f"Error : {name} matches several teams: {', '.join(candidates)}")
+        if not candidates:
+            raise ValueError(f"Error : {name} is not a team I can find, check !teams")
+        return candidates[0]
+
+    def _insert(self, team: str):
+        state = 0
+        for char in team:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._out[state].append(team)
+
+    def _link(self):
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] += self._out[self._fail[child]]
+                queue.append(child)
+
+    @staticmethod
+    def _bounded(text: str, start: int, end: int) -> bool:
+        return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+class Teams:
+    """The teams of the league, loaded and compiled once; reload() after editing the teams."""
+
+    def __init__(self):
+        self._matcher: TeamMatcher = None
+
+    @property
+    def matcher(self) -> TeamMatcher:
+        if self._matcher is None:
+            self.reload()
+        return self._matcher
+
+    def reload(self):
+        self._matcher = TeamMatcher(STORAGE.load_teams())
+
+    def all(self) -> list[str]:
+        return list(self.matcher.confs)
+
+    def by_conf(self) -> dict[str, list[str]]:
+        teams = {}
+        for team, conf in self.matcher.confs.items():
+            teams.setdefault(conf, []).append(team)
+        return teams
+
+    def conf(self, team: str) -> str:
+        return self.matcher.confs[team]
+
+    def find_all(self, text: str) -> list[TeamMatch]:
+        return self.matcher.find_all(text.lower())
+
+    def resolve(self, name: str) -> str:
+        return self.matcher.resolve(name)
+
+
+TEAMS = Teams()
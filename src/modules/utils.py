@@ -1,8 +1,6 @@
 from __future__ import annotations
 
-import glob
-import json
-import os
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Iterable
 
 import discord
@@ -10,7 +8,12 @@ from discord import Embed
 from discord.ext import menus
 from discord.ext.menus.views import ViewMenuPages
 
+import config
 from src.modules.colors import Color
+from src.modules.events import EVENTS
+from src.modules.game_index import GAMES
+from src.modules.players import SERVER
+from src.modules.storage import STORAGE
 from src.modules.table import Team
 
 
@@ -26,12 +29,61 @@ class TeamsList(menus.ListPageSource):
             .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
 
 
-class MatchdayList(menus.ListPageSource):
-    def __init__(self, data, matchday=None):
-        super().__init__(data, per_page=7)
-        self.matchday = matchday
+class PageCache:
+    """LRU cache of rendered pages."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._pages: OrderedDict[tuple, Embed] = OrderedDict()
+
+    def get(self, key: tuple):
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+        return page
+
+    def put(self, key: tuple, page: Embed):
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.size:
+            self._pages.popitem(last=False)
+
+
+class CachedPageSource(menus.ListPageSource):
+    """A ListPageSource whose pages are rendered once per (source type, key, conf, variant, page, data version).
+
+    version is the one SERVER.versioned returned with the data, sources built without version are never cached.
+    A page rendered after the data changed may show the new values, it is not cached under the old version."""
+    cache = PageCache(config.page_cache_size)
+
+    def __init__(self, data, per_page, key=None, conf=None, version=None, variant=None):
+        super().__init__(data, per_page=per_page)
+        self.key = key
+        self.conf = conf
+        self.version = version
+        self.variant = variant
 
     async def format_page(self, menu: discord.ext.menus.Menu, entries):
+        if self.version is None:
+            return self.render_page(menu, entries)
+        cache_key = (type(self).__name__, self.key, self.conf, self.variant, menu.current_page, self.version)
+        page = CachedPageSource.cache.get(cache_key)
+        if page is None:
+            page = self.render_page(menu, entries)
+            if SERVER.version == self.version:
+                CachedPageSource.cache.put(cache_key, page)
+        return page
+
+    def render_page(self, menu: discord.ext.menus.Menu, entries) -> Embed:
+        raise NotImplementedError
+
+
+class MatchdayList(CachedPageSource):
+    def __init__(self, data, matchday=None, **kwargs):
+        super().__init__(data, per_page=7, key=matchday, **kwargs)
+        self.matchday = matchday
+
+    def render_page(self, menu: discord.ext.menus.Menu, entries):
         offset = menu.current_page * self.per_page
         embed = Embed(color=Color.DEFAULT, title=f"Matchday n°{self.matchday}")
         for _, result in enumerate(entries, start=offset):
@@ -43,36 +95,51 @@ class MatchdayList(menus.ListPageSource):
         return embed
 
 
-class NormalLeaderboardList(menus.ListPageSource):
+class MatchdaysOverviewList(CachedPageSource):
+    def __init__(self, data, **kwargs):
+        super().__init__(data, per_page=20, **kwargs)
 
-    def __init__(self, data, key=None):
-        super().__init__(data, per_page=20)
-        self.key = key
+    def render_page(self, menu: discord.ext.menus.Menu, entries):
+        confs = list(entries[0][1].keys()) if entries else []
+        desc = '```\n'
+        desc += f'{"md":<4} ' + " ".join(f"{conf:>10}" for conf in confs) + f' {"warnings":>9}\n\n'
+        for matchday, done, warned in entries:
+            played = " ".join(f"{'done' if n >= expected else f'{n}/{expected}':>10}"
+                              for n, expected in done.values())
+            desc += f"{add_zero(matchday):<4} {played} {warned or '':>9}\n"
+        return Embed(color=Color.DEFAULT, title="Matchdays", description=desc + "```") \
+            .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
 
-    async def format_page(self, menu: discord.ext.menus.Menu, entries):
+
+class NormalLeaderboardList(CachedPageSource):
+
+    def __init__(self, data, key=None, **kwargs):
+        super().__init__(data, per_page=20, key=key, **kwargs)
+
+    def render_page(self, menu: discord.ext.menus.Menu, entries):
         offset = menu.current_page * self.per_page
         desc = '```\n'
         r = f"{self.key}/{'mins' if self.key != 'cs' else 'half'} %"
         desc += f'pos {"name":<20} {self.key:>10} {"time":>10} {r:>12}\n\n'
+        page_ratios = ratios([stat for _, stat, _ in entries], [time for _, _, time in entries], self.key)
         return Embed(
             color=Color.DEFAULT,
             description=
             desc + '\n'.join(
-                [f"{add_zero(i + 1)}) {player:<20} {stat:>10} {format_time(time):>10} {ratio(stat, time, self.key)}"
-                 for i, (player, stat, time) in
-                 enumerate(entries, start=offset)])
+                [f"{add_zero(i + 1)}) {player:<20} {stat:>10} {format_time(time):>10} {rat}"
+                 for i, ((player, stat, time), rat) in
+                 enumerate(zip(entries, page_ratios), start=offset)])
             + "```"
         ) \
             .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
 
 
-class TimeLeaderboardList(menus.ListPageSource):
+class TimeLeaderboardList(CachedPageSource):
 
-    def __init__(self, data, key=None):
-        super().__init__(data, per_page=20)
-        self.key = key
+    def __init__(self, data, key=None, **kwargs):
+        super().__init__(data, per_page=20, key=key, **kwargs)
 
-    async def format_page(self, menu: discord.ext.menus.Menu, entries):
+    def render_page(self, menu: discord.ext.menus.Menu, entries):
         offset = menu.current_page * self.per_page
         desc = '```\n'
         desc += f'pos {"name":<20} {"time":>10}\n\n'
@@ -87,12 +154,13 @@ class TimeLeaderboardList(menus.ListPageSource):
             .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
 
 
-class TableList(menus.ListPageSource):
+class TableList(CachedPageSource):
 
-    def __init__(self, data):
-        super().__init__(data, per_page=20)
+    def __init__(self, data, moves: dict[str, int] = None, **kwargs):
+        super().__init__(data, per_page=20, **kwargs)
+        self.moves = moves or {}
 
-    async def format_page(self, menu: discord.ext.menus.Menu, entries: Iterable[Team]):
+    def render_page(self, menu: discord.ext.menus.Menu, entries: Iterable[Team]):
         offset = menu.current_page * self.per_page
         desc = '```\n'
         desc += f'{"pos":4} {"team":^20} {"GP":>3} {"W":>3} ' \
@@ -103,12 +171,37 @@ class TableList(menus.ListPageSource):
             desc + '\n'.join([f"{add_zero(i + 1)}) {team.name:^20} {team.games_played:>3} {team.wins:>3} "
                               f"{team.draws:>3} {team.losses:>3} {team.goals_for:>3}"
                               f" {team.goals_against:>3} {team.goals_diff:>3} {team.points:>3}"
+                              f" {format_move(self.moves.get(team.name))}"
                               for i, team in enumerate(entries, start=offset)])
             + "```"
         ) \
             .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
 
 
+class PlayerGamesList(CachedPageSource):
+    """Games of a player, the most recent first; with form=True, the totals of those games on top."""
+
+    def __init__(self, data, form: bool = False, **kwargs):
+        super().__init__(data, per_page=10, **kwargs)
+        self.form = form
+
+    def render_page(self, menu: discord.ext.menus.Menu, entries):
+        desc = '```\n'
+        if self.form:
+            lines = self.entries
+            desc += ", ".join(f"{sum(line.stats[s] for line in lines)} {s}"
+                                for s in ('goals', 'assists', 'saves', 'cs', 'own goals')) \
+                    + f" in {format_time(sum(line.stats['time'] for line in lines))}\n\n"
+        desc += f'{"md":<4} {"game":<30} {"time":>9} {"G":>2} {"A":>2} {"S":>2} {"CS":>2} {"OG":>2}\n\n'
+        desc += "\n".join(f"{add_zero(line.matchday):<4} {line.title[:30]:<30} "
+                          f"{format_time(line.stats['time']):>9} {line.stats['goals']:>2} {line.stats['assists']:>2} "
+                          f"{line.stats['saves']:>2} {line.stats['cs']:>2} {line.stats['own goals']:>2}"
+                          for line in entries)
+        title = f"{self.key}, last {len(self.entries)} games" if self.form else f"{self.key}, games"
+        return Embed(color=Color.DEFAULT, title=title, description=desc + "```") \
+            .set_footer(text=f"[ {menu.current_page + 1} / {self.get_max_pages()} ]")
+
+
 async def create_menu(cls, ctx, data, **kwargs):
     pages = ViewMenuPages(source=cls(data, **kwargs), clear_reactions_after=True, timeout=None)
     await pages.start(ctx)
@@ -121,44 +214,55 @@ def format_time(seconds):
     return f"{m}m{s}sec"
 
 
+def format_move(places) -> str:
+    if places is None:
+        return ""
+    return "=" if places == 0 else f"↑{places}" if places > 0 else f"↓{-places}"
+
+
+def parse_matchday(option: str):
+    """Read an optional `md=N` argument, None when not given."""
+    if option is None:
+        return None
+    try:
+        return int(option.lower().removeprefix("md="))
+    except ValueError:
+        raise ValueError(f"Error : Could not understand {option}, it must be like md=7")
+
+
 def add_zero(number) -> str:
     return f"0{number}" if number < 10 else str(number)
 
 
 def find_game(matchday: int, *teams):
-    path = os.path.join("resources/results/", str(matchday))
-    filenames = [filename for filename in glob.glob(f"{path}/*")]
-    try:
-        results = [filename for filename in filenames if any(team in filename for team in teams)]
-        if len(results) > 1:
-            raise ValueError(f"Error : Found more than one match with matchday: {matchday} and team(s) {teams}")
-        return json.load(open(results[0]))
-    except ValueError:
-        raise
-    except Exception:
-        raise ValueError(f"Error : Could not find a match with matchday: {matchday} and team(s) {teams}")
+    return STORAGE.load_game(matchday, GAMES.find(matchday, *teams))
 
 
 def game_exists(matchday, *teams):
-    path = os.path.join("resources/results/", str(matchday))
-    filenames = [filename for filename in glob.glob(f"{path}/*")]
-    results = [filename for filename in filenames if any(team in filename for team in teams)]
-    return len(results) == 1
+    return any(GAMES.title(matchday, team) is not None for team in teams)
 
 
-def delete_game(matchday: int, *teams):
-    path = os.path.join("resources/results/", str(matchday))
-    filenames = [filename for filename in glob.glob(f"{path}/*")]
-    try:
-        results = [filename for filename in filenames if any(team in filename for team in teams)]
-        if len(results) > 1:
-            raise ValueError(f"Error : Found more than one match with matchday: {matchday} and team(s) {teams}")
-        os.remove(results[0])
-        return results[0]
-    except ValueError:
-        raise
-    except Exception:
-        raise ValueError(f"Error : Could not find a match with matchday: {matchday} and team(s) {teams}")
+def delete_game(matchday: int, *teams, author: str = None):
+    """Delete a result and take it out of the aggregates, return it."""
+    SERVER.ensure_loaded()
+    game = find_game(matchday, *teams)
+    EVENTS.record_delete(game, author)
+    STORAGE.delete_game(matchday, game["title"])
+    GAMES.remove(game)
+    SERVER.apply(old_game=game)
+    return game
+
+
+def add_malus(team: str, author: str = None):
+    teams = STORAGE.load_malus()
+    all_teams = list(teams["western"].keys()) + list(teams["eastern"].keys())
+    if team not in all_teams:
+        raise ValueError(f"Error : {team} is not a team I can find.")
+    conf = "western" if team in teams["western"] else "eastern"
+    teams[conf][team] += 1
+    EVENTS.record_malus(conf, team, teams[conf][team], author)
+    STORAGE.save_malus(teams)
+    SERVER.update_malus()
 
 
 def all_tuple_to_int(values):
@@ -186,3 +290,8 @@ def ratio(stat, time, key):
         t = time // (60 * 7)
     rat = stat / t if t != 0 else stat
     return f"{rat * 100:>10.2f}"
+
+
+def ratios(stats: Iterable[int], times: Iterable[int], key) -> list[str]:
+    """ratio of each row of a page."""
+    return [ratio(stat, time, key) for stat, time in zip(stats, times)]